@@ -1,5 +1,6 @@
 goog.provide('cryptagram.decoder');
 
+goog.require('cryptagram.codec.aesthet2');
 goog.require('cryptagram.codec.aesthete');
 goog.require('cryptagram.codec.bacchant');
 goog.require('cryptagram.storage');
@@ -111,7 +112,8 @@ cryptagram.decoder.prototype.decodeDataWithQuality = function(data, codec, callb
 
 cryptagram.decoder.prototype.getCodec = function(img, imageData) {
 
-  var knownCodecs = [cryptagram.codec.aesthete, cryptagram.codec.bacchant];
+  var knownCodecs = [cryptagram.codec.aesthete, cryptagram.codec.aesthet2,
+                     cryptagram.codec.bacchant];
   var testCodec;
   for (var i = 0; i < knownCodecs.length; i++) {
     testCodec = new knownCodecs[i]();
@@ -0,0 +1,62 @@
+goog.provide('cryptagram.cipher.aesthet2');
+
+goog.require('cryptagram.cipher.aesthete');
+goog.require('goog.debug.Logger');
+
+/**
+ * @constructor
+ * @extends {cryptagram.cipher.aesthete}
+ */
+cryptagram.cipher.aesthet2 = function() {};
+
+goog.inherits(cryptagram.cipher.aesthet2, cryptagram.cipher.aesthete);
+
+cryptagram.cipher.aesthet2.prototype.logger =
+  goog.debug.Logger.getLogger('cryptagram.cipher.aesthet2');
+
+/**
+ * The plaintext is the JPEG's bytes, so it is decrypted to bits (sjcl.decrypt
+ * would read them as UTF-8) and base64 encoded for the data URI.
+ */
+cryptagram.cipher.aesthet2.prototype.decrypt = function(newBase64, password) {
+
+  var check = newBase64.substring(0,64);
+  var iv = newBase64.substring(64,86);
+  var salt = newBase64.substring(86,97);
+  var ct = newBase64.substring(97,newBase64.length);
+  var full = newBase64.substring(64,newBase64.length);
+
+  var bits = sjcl.hash.sha256.hash(full);
+  var hexHash = sjcl.codec.hex.fromBits(bits);
+
+  this.logger.info("Decrypting Image");
+
+  this.logger.shout("DECRYPT_HASH_EMBED " + check);
+
+  if (hexHash != check) {
+    this.logger.severe("DECRYPT_FAILED_HASH_CALC " + hexHash);
+    return;
+  } else {
+    this.logger.info("Checksum passed.");
+  }
+
+  var params = {iter: sjcl.json.defaults.iter,
+                salt: sjcl.codec.base64.toBits(salt)};
+  var decrypted;
+
+  try {
+    var key = sjcl.misc.cachedPbkdf2(password, params).key.slice(
+      0, sjcl.json.defaults.ks / 32);
+    decrypted = sjcl.codec.base64.fromBits(sjcl.mode.ccm.decrypt(
+      new sjcl.cipher.aes(key), sjcl.codec.base64.toBits(ct),
+      sjcl.codec.base64.toBits(iv), [], sjcl.json.defaults.ts));
+  } catch(err) {
+    this.logger.severe("DECRYPT_FAILED " + hexHash + " " + err.toString());
+    return null;
+  }
+
+  this.logger.shout("DECRYPT_OUT_LEN " + decrypted.length);
+
+  var payload = this.URIHeader + decrypted;
+  return payload;
+};
@@ -0,0 +1,83 @@
+goog.provide('cryptagram.codec.aesthet2');
+
+goog.require('cryptagram.cipher.aesthet2');
+goog.require('cryptagram.codec.aesthete');
+goog.require('goog.debug.Logger');
+
+
+/**
+ * The aesthete image layout carrying version 2 payloads, whose ciphertext is
+ * of the JPEG's bytes rather than of their base64 (see
+ * desktop/Encryptor.py). Their header is not a codec name but carries the
+ * payload's parameters (see parseHeader).
+ * @constructor
+ * @extends {cryptagram.codec.aesthete}
+ */
+cryptagram.codec.aesthet2 = function() {
+  goog.base(this);
+  this.cipher = new cryptagram.cipher.aesthet2();
+};
+
+goog.inherits(cryptagram.codec.aesthet2, cryptagram.codec.aesthete);
+
+cryptagram.codec.aesthet2.prototype.logger =
+  goog.debug.Logger.getLogger('cryptagram.codec.aesthet2');
+
+
+/** @inheritDoc */
+cryptagram.codec.aesthet2.prototype.name = function() {
+  return "aesthet2";
+};
+
+
+/**
+ * Parses a header of the layout desktop/PayloadHeader.py writes: 'C', six
+ * base64 digits holding the payload version (4 bits), the Reed-Solomon n and
+ * k (8 bits each, 0 without ECC) and the interleave depth (12 bits) above 4
+ * zero bits, then a check digit, the sum of the others modulo 64.
+ * @param {string} header The eight decoded header characters.
+ * @return {Object} The header's version, n, k and depth, or null if it is
+ *     not of that layout.
+ */
+cryptagram.codec.aesthet2.prototype.parseHeader = function(header) {
+  if (header.length != 8 || header.charAt(0) != 'C') {
+    return null;
+  }
+  var field = 0;
+  var sum = this.base64Values.indexOf('C');
+  for (var i = 1; i < 7; i++) {
+    var digit = this.base64Values.indexOf(header.charAt(i));
+    if (digit < 0) {
+      return null;
+    }
+    // 36 bits, beyond JavaScript's 32 bit integer operators.
+    field = field * 64 + digit;
+    sum += digit;
+  }
+  if (sum % 64 != this.base64Values.indexOf(header.charAt(7)) ||
+      field % 16 != 0) {
+    return null;
+  }
+  return {version: Math.floor(field / Math.pow(2, 32)),
+          n: Math.floor(field / Math.pow(2, 24)) % 256,
+          k: Math.floor(field / Math.pow(2, 16)) % 256,
+          depth: Math.floor(field / 16) % 4096};
+};
+
+
+/**
+ * Takes version 2 payloads without ECC; there is no Reed-Solomon decoder
+ * here.
+ * @inheritDoc
+ */
+cryptagram.codec.aesthet2.prototype.test = function(img, imageData) {
+  var header = this.parseHeader(this.getHeader(img, imageData));
+  if (!header || header.version != 2) {
+    return false;
+  }
+  if (header.n != 0) {
+    this.logger.severe("UNSUPPORTED_ECC " + header.n + "," + header.k);
+    return false;
+  }
+  return true;
+};
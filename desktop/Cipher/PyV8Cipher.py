@@ -1,12 +1,76 @@
 #!/usr/bin/env python
+import base64
 import os
 import logging
 import PyV8
+import Queue
 import threading
-import time
 from json import JSONDecoder
 
+class V8ContextPool(object):
+  # JS contexts with sjcl.js already evaluated, leased out one call at a time
+  # so sjcl is parsed once per context rather than once per call. A warm
+  # context also keeps sjcl's PBKDF2 cache, so a password's key is derived
+  # once, as in the browser.
+  def __init__(self, sjcljs, size):
+    with open(sjcljs) as fh:
+      self.sjcl = fh.read()
+    self.contexts = Queue.Queue()
+    for _ in range(size):
+      self.contexts.put(self._new_context())
+
+  def _new_context(self):
+    with PyV8.JSLocker():
+      context = PyV8.JSContext()
+      with context:
+        context.eval(self.sjcl)
+        # Called with the password and message as arguments, so they are
+        # never pasted into (and parsed as) source text.
+        context.eval('var PyV8Encrypt = function(password, message) {'
+                     '  return sjcl.encrypt(password, message);'
+                     '};'
+                     'var PyV8Decrypt = function(password, message) {'
+                     '  return sjcl.decrypt(password, message);'
+                     '};')
+        # Bytes cross into and out of JS as base64; sjcl encrypts the bits
+        # they stand for, and decrypt stops short of reading them as UTF-8.
+        context.eval('var PyV8EncryptBytes = function(password, data) {'
+                     '  return sjcl.encrypt(password,'
+                     '                      sjcl.codec.base64.toBits(data));'
+                     '};'
+                     'var PyV8DecryptBytes = function(password, message) {'
+                     '  var p = sjcl.json.decode(message), k;'
+                     '  for (k in sjcl.json.defaults) {'
+                     '    if (p[k] === undefined) {'
+                     '      p[k] = sjcl.json.defaults[k];'
+                     '    }'
+                     '  }'
+                     '  var key = sjcl.misc.cachedPbkdf2(password, p).key'
+                     '      .slice(0, p.ks / 32);'
+                     '  return sjcl.codec.base64.fromBits(sjcl.mode[p.mode]'
+                     '      .decrypt(new sjcl.cipher[p.cipher](key), p.ct,'
+                     '               p.iv, sjcl.codec.utf8String.toBits('
+                     '                 p.adata), p.ts));'
+                     '};')
+    return context
+
+  def call(self, function, *args):
+    # Blocks until a context is free.
+    context = self.contexts.get()
+    try:
+      with PyV8.JSLocker():
+        with context:
+          return getattr(context.locals, function)(*args)
+    finally:
+      self.contexts.put(context)
+
+
 class V8Cipher(object):
+  # Warm contexts kept per sjcl.js, shared by every V8Cipher.
+  POOL_SIZE = 2
+  _pools = {}
+  _pools_lock = threading.Lock()
+
   def __init__(self, password, command_line = False):
     self.password = password
 
@@ -18,70 +82,25 @@ class V8Cipher(object):
       logging.error('Could not find sjcl.js.')
       raise Exception('Could not find sjcl.js.')
 
-  def _do_code(self, action, message):
-    # Based on the specified action, set the coder.
-    coder_class = PyV8Encode if action == 'encode' else PyV8Decode
-
-    coder = coder_class(self.password, message, self.sjcljs)
-    coder.run()
-    while True:
-      result = coder.get_result()
-      if result:
-        break
-      time.sleep(0.5)
-    return result
+    sjcljs = os.path.abspath(self.sjcljs)
+    with self._pools_lock:
+      if sjcljs not in self._pools:
+        self._pools[sjcljs] = V8ContextPool(sjcljs, self.POOL_SIZE)
+      self.pool = self._pools[sjcljs]
 
   def encode(self, message):
-    return self._do_code('encode', message)
+    resp = self.pool.call('PyV8Encrypt', self.password, message)
+    return JSONDecoder().decode(resp)
 
   def decode(self, message):
     # Expect message to be a JSON string.
-    return self._do_code('decode', message)
-
-
-class PyV8Encode(threading.Thread):
-  result = None
-
-  def __init__(self, password, message, sjcljs):
-    threading.Thread.__init__(self)
-    self.password = password
-    self.message = message
-    self.sjcljs = sjcljs
-
-  def get_result(self):
-    return self.result
-
-  def run(self):
-    with PyV8.JSIsolate():
-      with PyV8.JSContext() as context:
-        with open(self.sjcljs) as fh:
-          sjcl = fh.read()
-        context.eval(sjcl)
-        resp = context.eval('sjcl.encrypt("%s", "%s");' % (self.password,
-                                                           self.message))
-        self.result = JSONDecoder().decode(resp)
-        del context
-
-class PyV8Decode(threading.Thread):
-  result = None
-
-  def __init__(self, password, message, sjcljs):
-    threading.Thread.__init__(self)
-    self.password = password
-    self.message = message
-    self.sjcljs = sjcljs
-
-  def get_result(self):
-    return self.result
+    return self.pool.call('PyV8Decrypt', self.password, message)
 
-  def run(self):
-    with PyV8.JSIsolate():
-      with PyV8.JSContext() as context:
-        with open(self.sjcljs) as fh:
-          sjcl = fh.read()
-        context.eval(sjcl)
-        resp = context.eval('sjcl.decrypt("%s", \'%s\')' % \
-                              (self.password, self.message))
-        self.result = resp
-        del context
+  def encode_bytes(self, data):
+    resp = self.pool.call('PyV8EncryptBytes', self.password,
+                          base64.b64encode(data))
+    return JSONDecoder().decode(resp)
 
+  def decode_bytes(self, message):
+    return base64.b64decode(
+      self.pool.call('PyV8DecryptBytes', self.password, message))
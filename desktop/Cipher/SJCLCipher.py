@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# sjcl.encrypt/sjcl.decrypt in Python, on PyCrypto's AES. Produces and
+# consumes the same JSON (iv, salt and ct in unpadded base64, plus any
+# parameter that differs from sjcl's defaults) as Cipher/sjcl.js, so images
+# stay decryptable by the browser extension and the mobile apps. PyCrypto 2.6
+# has no CCM mode, so CCM is built here from its CBC (for the MAC) and CTR
+# modes, following sjcl.mode.ccm.
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import struct
+import urllib
+from Crypto.Cipher import AES
+from Crypto.Util import Counter
+
+class SJCLCipher(object):
+  # sjcl.json.defaults.
+  DEFAULTS = {'v': 1, 'iter': 1000, 'ks': 128, 'ts': 64, 'mode': 'ccm',
+              'adata': '', 'cipher': 'aes'}
+
+  IV_LENGTH = 16
+  SALT_LENGTH = 8
+
+  def __init__(self, password, command_line = False):
+    if isinstance(password, unicode):
+      password = password.encode('utf-8')
+    self.password = password
+    # Like sjcl.misc.cachedPbkdf2, encode uses one salt per password, so the
+    # key is derived once; decode caches keys by salt and parameters.
+    self.salt = os.urandom(self.SALT_LENGTH)
+    self._keys = {}
+
+  def _key(self, salt, iterations, key_size):
+    # PBKDF2-HMAC-SHA256; sjcl takes the first key_size bits of its first
+    # block.
+    cache_key = (salt, iterations, key_size)
+    if cache_key not in self._keys:
+      self._keys[cache_key] = hashlib.pbkdf2_hmac(
+        'sha256', self.password, salt, iterations, 32)[:key_size // 8]
+    return self._keys[cache_key]
+
+  @staticmethod
+  def _b64encode(data):
+    # sjcl.codec.base64.fromBits(data, 1): no padding.
+    return base64.b64encode(data).rstrip('=')
+
+  @staticmethod
+  def _b64decode(data):
+    data = str(data).translate(None, ' \t\r\n=')
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+  @staticmethod
+  def _length_size(iv, data_length):
+    # The number of bytes of the CCM length field, L: at least 2, enough for
+    # data_length and no fewer than the iv leaves room for.
+    size = 2
+    while size < 4 and data_length >> (8 * size):
+      size += 1
+    return max(size, 15 - len(iv))
+
+  def _mac(self, aes_key, nonce, plaintext, adata, tag_length, size):
+    # CBC-MAC of the B_0 block, the length-prefixed adata and the plaintext,
+    # each zero padded to whole blocks (sjcl.mode.ccm.G).
+    flags = (64 if adata else 0) | (tag_length - 2) << 2 | (size - 1)
+    b0 = chr(flags) + nonce + struct.pack('>Q', len(plaintext))[-size:]
+    blocks = [b0]
+    if adata:
+      if len(adata) <= 0xfeff:
+        header = struct.pack('>H', len(adata))
+      else:
+        header = '\xff\xfe' + struct.pack('>I', len(adata))
+      blocks.append(header + adata)
+      blocks.append('\0' * (-len(blocks[-1]) % 16))
+    blocks.append(plaintext)
+    blocks.append('\0' * (-len(plaintext) % 16))
+    mac = AES.new(aes_key, AES.MODE_CBC, '\0' * 16).encrypt(''.join(blocks))
+    return mac[-16:][:tag_length]
+
+  def _ctr(self, aes_key, nonce, data, tag, size):
+    # Encrypts (or decrypts) data from counter 1 on and the tag with counter
+    # 0 (sjcl.mode.ccm.I). sjcl counts in the last 32 bit word of the block.
+    a0 = chr(size - 1) + nonce + '\0' * size
+    tag = ''.join(chr(ord(x) ^ ord(y)) for x, y in
+                  zip(tag, AES.new(aes_key, AES.MODE_ECB).encrypt(a0)))
+    counter = Counter.new(32, prefix=a0[:12],
+                          initial_value=struct.unpack('>I', a0[12:])[0] + 1)
+    data = AES.new(aes_key, AES.MODE_CTR, counter=counter).encrypt(data)
+    return data, tag
+
+  def _ccm_encrypt(self, aes_key, iv, plaintext, adata, tag_length):
+    size = self._length_size(iv, len(plaintext))
+    nonce = iv[:15 - size]
+    tag = self._mac(aes_key, nonce, plaintext, adata, tag_length, size)
+    data, tag = self._ctr(aes_key, nonce, plaintext, tag, size)
+    return data + tag
+
+  def _ccm_decrypt(self, aes_key, iv, ciphertext, adata, tag_length):
+    data, tag = ciphertext[:-tag_length], ciphertext[-tag_length:]
+    size = self._length_size(iv, len(data))
+    nonce = iv[:15 - size]
+    plaintext, tag = self._ctr(aes_key, nonce, data, tag, size)
+    if tag != self._mac(aes_key, nonce, plaintext, adata, tag_length, size):
+      raise ValueError("ccm: tag doesn't match")
+    return plaintext
+
+  def encode(self, message):
+    # Returns sjcl.encrypt's JSON, parsed: a dict with the base64 iv, salt
+    # and ct. A unicode message is encrypted as UTF-8, as sjcl does.
+    if isinstance(message, unicode):
+      message = message.encode('utf-8')
+    return self.encode_bytes(message)
+
+  def encode_bytes(self, data):
+    # As encode, but for any bytes (sjcl.encrypt of a bitArray).
+    logging.info('Encrypting message.')
+    iv = os.urandom(self.IV_LENGTH)
+    key = self._key(self.salt, self.DEFAULTS['iter'], self.DEFAULTS['ks'])
+    ciphertext = self._ccm_encrypt(key, iv, data, '',
+                                   self.DEFAULTS['ts'] // 8)
+    logging.info('Message encrypted')
+    return {'iv': self._b64encode(iv), 'salt': self._b64encode(self.salt),
+            'ct': self._b64encode(ciphertext)}
+
+  def decode(self, message):
+    # Expect message to be a JSON string, as sjcl.decrypt does.
+    return self.decode_bytes(message).decode('utf-8')
+
+  def decode_bytes(self, message):
+    # As decode, but returns the plaintext bytes as they are.
+    parameters = dict(self.DEFAULTS)
+    parameters.update(json.loads(message))
+    if parameters['mode'] != 'ccm' or parameters['cipher'] != 'aes' or \
+          parameters['iter'] <= 100 or \
+          parameters['ts'] not in (64, 96, 128) or \
+          parameters['ks'] not in (128, 192, 256):
+      raise ValueError('json decrypt: invalid parameters')
+    iv = self._b64decode(parameters['iv'])
+    if not 8 <= len(iv) <= 16:
+      raise ValueError('json decrypt: invalid parameters')
+
+    key = self._key(self._b64decode(parameters['salt']), parameters['iter'],
+                    parameters['ks'])
+    adata = urllib.unquote(str(parameters['adata']))
+    logging.info('Decrypting message.')
+    return self._ccm_decrypt(key, iv, self._b64decode(parameters['ct']),
+                             adata, parameters['ts'] // 8)
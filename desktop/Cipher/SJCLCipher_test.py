@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+from Cipher.SJCLCipher import SJCLCipher
+import json
+import unittest
+
+class SJCLCipherTest(unittest.TestCase):
+  # Produced by Cipher/sjcl.js: sjcl.encrypt(password, message, {iv: IV,
+  # salt: SALT}).
+  IV = 'AAECAwQFBgcICQoLDA0ODw'
+  SALT = 'EBESExQVFhc'
+  VECTORS = [
+    ('', '9F7nLO0GNU4'),
+    ('a', 'bhLiE9OhKjoV'),
+    ('aGVsbG8gd29ybGQ=', 'bqHXZzCH0S/TN8kH3so/BeBL8q/A/2BW'),
+  ]
+
+  def setUp(self):
+    self.cipher = SJCLCipher('correct horse')
+
+  def _json(self, **fields):
+    return json.dumps(dict({'iv': self.IV, 'salt': self.SALT}, **fields))
+
+  def test_decode_sjcl(self):
+    for message, ct in self.VECTORS:
+      self.assertEqual(message, self.cipher.decode(self._json(ct=ct)))
+
+  def test_encode_matches_sjcl(self):
+    key = self.cipher._key(SJCLCipher._b64decode(self.SALT), 1000, 128)
+    iv = SJCLCipher._b64decode(self.IV)
+    for message, ct in self.VECTORS:
+      self.assertEqual(ct, SJCLCipher._b64encode(
+        self.cipher._ccm_encrypt(key, iv, message, '', 8)))
+
+  def test_decode_sjcl_parameters(self):
+    # Non-default key and tag sizes, iterations and adata; a 12 byte iv.
+    cipher = SJCLCipher(u'p\xe4ssw\xf6rd')
+    self.assertEqual('x', cipher.decode(self._json(
+      iter=2000, ks=256, ts=128, adata='head', ct='tqnr4aEjsTwUcXXfENonx+A')))
+    self.assertEqual('x', SJCLCipher('pw').decode(
+      json.dumps({'iv': 'AAECAwQFBgcICQoL', 'salt': self.SALT,
+                  'ct': 'dWJFslwUZxCy'})))
+
+  def test_round_trip(self):
+    # Long enough for a three byte CCM length field.
+    message = 'QUJD' * 20000
+    encoded = self.cipher.encode(message)
+    self.assertEqual(['ct', 'iv', 'salt'], sorted(encoded))
+    self.assertFalse(encoded['ct'].endswith('='))
+    self.assertEqual(message,
+                     SJCLCipher('correct horse').decode(json.dumps(encoded)))
+
+  def test_bytes(self):
+    # sjcl.encrypt(password, sjcl.codec.hex.toBits('00ff80c3e9'), ...).
+    self.assertEqual('\x00\xff\x80\xc3\xe9', self.cipher.decode_bytes(
+      self._json(ct='DxkB17v7SBfl2EKIvA')))
+    data = ''.join(chr(i) for i in range(256)) * 300
+    self.assertEqual(data, self.cipher.decode_bytes(
+      json.dumps(self.cipher.encode_bytes(data))))
+
+  def test_wrong_password(self):
+    self.assertRaises(ValueError, SJCLCipher('wrong').decode,
+                      self._json(ct=self.VECTORS[1][1]))
+
+  def test_invalid_parameters(self):
+    for fields in ({'mode': 'ocb2'}, {'iter': 100}, {'ts': 32}):
+      self.assertRaises(ValueError, self.cipher.decode,
+                        self._json(ct=self.VECTORS[1][1], **fields))
+
+
+if __name__ == '__main__':
+  unittest.main()
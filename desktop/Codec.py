@@ -1,26 +1,118 @@
 #!/usr/bin/env python
 import logging
+import multiprocessing
+import numpy
 import threading
+import time
 from NewImageDimensions import NewImageDimensions
 from PIL import Image
+from multiprocessing.sharedctypes import RawArray
 from ImageCoder import Base64SymbolSignalCoder, Base64MessageSymbolCoder
 from SymbolShape import two_square
 
+class CodecJob(object):
+  # Handle on an encode or decode submitted with Codec.submit. Callers block
+  # in result() or register callbacks instead of polling the codec. A
+  # finished decode also carries the header and confidence it read.
+
+  def __init__(self, direction, data, progress_callback=None,
+               progress_interval=0.5):
+    self.direction = direction
+    self.data = data
+    self.progress_callback = progress_callback
+    self.progress_interval = progress_interval
+    self.header = None
+    self.confidence = None
+    self._last_progress = 0
+    self._finished = threading.Event()
+    self._lock = threading.Lock()
+    self._callbacks = []
+    self._result = None
+    self._exception = None
+
+  def done(self):
+    return self._finished.is_set()
+
+  def result(self, timeout=None):
+    # Wait for the job and return its image (encode) or data (decode),
+    # re-raising whatever the job raised.
+    if not self._finished.wait(timeout):
+      raise RuntimeError('Codec job did not finish within %s seconds.' %
+                         timeout)
+    if self._exception is not None:
+      raise self._exception
+    return self._result
+
+  def exception(self, timeout=None):
+    if not self._finished.wait(timeout):
+      raise RuntimeError('Codec job did not finish within %s seconds.' %
+                         timeout)
+    return self._exception
+
+  def add_done_callback(self, callback):
+    # callback(job) runs on the codec's thread once the job finishes, or
+    # immediately if it already has.
+    with self._lock:
+      if not self._finished.is_set():
+        self._callbacks.append(callback)
+        return
+    callback(self)
+
+  def _finish(self, result=None, exception=None):
+    with self._lock:
+      self._result = result
+      self._exception = exception
+      self._finished.set()
+      callbacks, self._callbacks = self._callbacks, []
+    for callback in callbacks:
+      try:
+        callback(self)
+      except Exception:
+        logging.exception('Codec job callback failed.')
+
+
 class Codec(threading.Thread):
   completed = 0
   data_length = 1
   direction = None
   data = None
   result = None
+  header = None
+  confidence = None
+  # The CodecJob running, whose progress callback _report_progress feeds.
+  _job = None
+
+  # Stripes handed to each decoding process, to even out the load.
+  STRIPES_PER_WORKER = 4
 
+  # Pixel formats the decoder can read symbols from: 'RGB' averages the three
+  # channels, 'L' reads the luminance plane alone (straight from the JPEG
+  # decoder's Y channel where possible).
+  DECODE_MODES = ('RGB', 'L')
+
+  # The header's two_square symbols fill the upper-left 8x8 block.
+  _HEADER_BOX = (0, 0, 8, 8)
+
+  # Bytes a pixel in the raw layouts _box_reader reads from a file itself.
+  _RAW_PIXEL_BYTES = {'L': 1, 'RGB': 3, 'BGR': 3}
+
+  # With with_confidence, decoding also sets confidence: an array holding,
+  # for each character of the result, how clearly its symbols read, from 0
+  # (a toss-up between two characters) to 1.
   def __init__(self, symbol_shape, wh_ratio, message_symbol_coder,
-               symbol_signal_coder, fixed_width=None):
+               symbol_signal_coder, fixed_width=None, num_workers=1,
+               decode_mode='RGB', with_confidence=False):
     threading.Thread.__init__(self)
+    assert decode_mode in self.DECODE_MODES
     self.symbol_shape = symbol_shape
     self.wh_ratio = wh_ratio
     self.message_symbol_coder = message_symbol_coder
     self.symbol_signal_coder = symbol_signal_coder
     self.fixed_width = fixed_width
+    self.num_workers = num_workers
+    self.decode_mode = decode_mode
+    self.with_confidence = with_confidence
+    self._job_lock = threading.Lock()
 
   def _new_image_dimensions(self, data):
     data_len = len(data)
@@ -63,6 +155,85 @@ class Codec(threading.Thread):
     elif self.direction == 'decode':
       self.decode(self.data)
 
+  def submit(self, direction, data, progress_callback=None,
+             progress_interval=0.5):
+    # Encode or decode data on a new thread and return a CodecJob for the
+    # result. progress_callback(fraction) is called from that thread at most
+    # once every progress_interval seconds, and with 1.0 on success. Jobs
+    # submitted to one codec run one at a time, in no particular order.
+    assert direction in ('encode', 'decode')
+    job = CodecJob(direction, data, progress_callback, progress_interval)
+    worker = threading.Thread(target=self._run_job, args=(job,))
+    worker.daemon = True
+    worker.start()
+    return job
+
+  def _run_job(self, job):
+    # The job finishes however it goes, even if the progress callback
+    # raises, so result() never waits forever.
+    with self._job_lock:
+      self._job = job
+      self.result = None
+      self.completed = 0
+      try:
+        if job.direction == 'encode':
+          self.encode(job.data)
+        else:
+          self.decode(job.data)
+          job.header, job.confidence = self.header, self.confidence
+        if job.progress_callback:
+          job.progress_callback(1.0)
+      except Exception, e:
+        logging.error('Codec %s failed: %s.' % (job.direction, e))
+        outcome = {'exception': e}
+      else:
+        outcome = {'result': self.result}
+      finally:
+        self._job = None
+    job._finish(**outcome)
+
+  def _report_progress(self):
+    # Hand the completed fraction to the running job's progress callback,
+    # throttled to one call per progress_interval seconds.
+    job = self._job
+    if job is None or not job.progress_callback:
+      return
+    now = time.time()
+    if now - job._last_progress < job.progress_interval:
+      return
+    job._last_progress = now
+    job.progress_callback(self.get_percent_complete())
+
+  def _stamp(self, canvas, top, left, columns, first, signals, labels):
+    # Paint len(signals) symbols into the grid of cells (columns wide) whose
+    # upper-left corner is (left, top), starting at raster cell first. labels is
+    # the shape geometry: labels[y, x] is the 1-based symbol index that owns the
+    # pixel, or zero for pixels the shape leaves untouched.
+    count = len(signals)
+    if not count:
+      return
+    shape_height, shape_width = labels.shape
+    rows = -(-(first + count) // columns)
+
+    # One (shape_height x shape_width) tile per grid cell; -1 marks pixels
+    # that must keep whatever is already on the canvas.
+    tiles = numpy.empty((rows * columns, shape_height, shape_width),
+                        dtype=numpy.int16)
+    tiles.fill(-1)
+    painted = labels > 0
+    tiles[first:first + count][:, painted] = signals[:, labels[painted] - 1]
+
+    # Lay the tiles out in raster order: (row, col, y, x) -> (row, y, col, x).
+    tiles = tiles.reshape(rows, columns, shape_height, shape_width)
+    tiles = tiles.swapaxes(1, 2).reshape(rows * shape_height,
+                                         columns * shape_width)
+
+    target = canvas[top:top + tiles.shape[0], left:left + tiles.shape[1]]
+    if target.shape != tiles.shape:
+      raise IndexError('image index out of range')
+    mask = tiles >= 0
+    target[mask] = tiles[mask]
+
   def encode(self, data):
     logging.info('Encoding data.')
 
@@ -75,24 +246,17 @@ class Codec(threading.Thread):
     new_image_num_symbols_width, new_image_num_symbols_height = \
         self.new_image_dimensions.get_image_symbol_dimensions()
 
-    new_image = Image.new('RGB', (new_image_width, new_image_height))
     logging.info('New image dimensions: width (%d) height (%d).' % \
                    (new_image_width, new_image_height))
     logging.info('Num symbols wide: %d. Num symbols high: %d.' % (
         new_image_num_symbols_width, new_image_num_symbols_height))
 
-    pixel = new_image.load()
+    # Luminance plane of the output; every pixel we write is gray.
+    canvas = numpy.zeros((new_image_height, new_image_width),
+                         dtype=numpy.uint8)
 
     shape_width, shape_height = self.symbol_shape.get_shape_size()
-
-    _shape_name = self.symbol_shape.get_name()
-    _symbol_to_signal = self.symbol_signal_coder.symbol_to_signal
-    _message_to_symbol = self.message_symbol_coder.message_to_symbol
-    _num_symbol_shapes = self.symbol_shape.get_num_symbol_shapes()
-
-    coords = {}
-    for sym_i in range(_num_symbol_shapes):
-      coords[sym_i + 1] = self.symbol_shape.get_symbol_shape_coords(sym_i + 1)
+    labels = self.symbol_shape.get_labels()
 
     # TODO(tierney): Encode the header before the payload. Account for header's
     # presence in the way we assign values in the payload.
@@ -102,30 +266,9 @@ class Codec(threading.Thread):
 
     # Write the header in the upper-left using our original 2x2 pixel block,
     # three-bit symbol encoding.
-    _header_symbol_signal_coder = Base64SymbolSignalCoder()
-    _header_message_symbol = Base64MessageSymbolCoder()
-    _header_num_symbols_wide = 2.
-    for i, header_char in enumerate(header):
-      symbol_values = _header_message_symbol.message_to_symbol(header_char)
-      _fill_0 = _header_symbol_signal_coder.symbol_to_signal(symbol_values[0])
-      fill_0 = (_fill_0, _fill_0, _fill_0)
-      _fill_1 = _header_symbol_signal_coder.symbol_to_signal(symbol_values[1])
-      fill_1 = (_fill_1, _fill_1, _fill_1)
-
-      y_coord = int(i / _header_num_symbols_wide)
-      x_coord = int(i - (y_coord * _header_num_symbols_wide))
-      base_x = x_coord * 4. # Shape width.
-      base_y = y_coord * 2.
-
-      pixel[base_x + 0, base_y + 0] = fill_0
-      pixel[base_x + 1, base_y + 0] = fill_0
-      pixel[base_x + 1, base_y + 1] = fill_0
-      pixel[base_x + 0, base_y + 1] = fill_0
-
-      pixel[base_x + 2, base_y + 0] = fill_1
-      pixel[base_x + 3, base_y + 0] = fill_1
-      pixel[base_x + 3, base_y + 1] = fill_1
-      pixel[base_x + 2, base_y + 1] = fill_1
+    header_signals = Base64SymbolSignalCoder().encode_many(
+      Base64MessageSymbolCoder().encode_many(header))
+    self._stamp(canvas, 0, 0, 2, 0, header_signals, two_square.get_labels())
 
     _num_header_row_symbols_wide = (new_image_width - 8) / shape_width
     num_header_row_symbols = \
@@ -135,98 +278,249 @@ class Codec(threading.Thread):
                    (num_header_row_symbols, _num_header_row_symbols_wide))
 
     self.completed = 0
-    for i, datum in enumerate(payload):
-      self.completed += 1
-      symbol_values = _message_to_symbol(datum)
-      assert (len(symbol_values) == _num_symbol_shapes)
-      _fill_0 = _symbol_to_signal(symbol_values[0])
-      fill_0 = (_fill_0, _fill_0, _fill_0)
-      _fill_1 = _symbol_to_signal(symbol_values[1])
-      fill_1 = (_fill_1, _fill_1, _fill_1)
-
-      if i < num_header_row_symbols:
-        y_coord = i / _num_header_row_symbols_wide
-        x_coord = (i - (y_coord * _num_header_row_symbols_wide))
-        base_x = 8 + (x_coord * shape_width)
-      else:
-        _i = i + 8 # Account for number of symbols in the header.
-        y_coord = int(_i / (1. * new_image_num_symbols_width))
-        x_coord = int(_i - (y_coord * new_image_num_symbols_width))
-        base_x = x_coord * shape_width
-      base_y = y_coord * shape_height
-
-      if _shape_name == 'two_square':
-        pixel[base_x + 0, base_y + 0] = fill_0
-        pixel[base_x + 1, base_y + 0] = fill_0
-        pixel[base_x + 1, base_y + 1] = fill_0
-        pixel[base_x + 0, base_y + 1] = fill_0
-
-        pixel[base_x + 2, base_y + 0] = fill_1
-        pixel[base_x + 3, base_y + 0] = fill_1
-        pixel[base_x + 3, base_y + 1] = fill_1
-        pixel[base_x + 2, base_y + 1] = fill_1
-
-      else:
-        for sym_i, symbol_val in enumerate(symbol_values):
-          fill = _symbol_to_signal(symbol_val)
-          for x,y in coords[sym_i + 1]:
-            pixel[base_x + x, base_y + y] = (fill, fill, fill)
-
-    self.result = new_image
+    self._report_progress()
+    symbols = self.message_symbol_coder.encode_many(payload)
+    assert (symbols.shape[1] == self.symbol_shape.get_num_symbol_shapes())
+    signals = self.symbol_signal_coder.encode_many(symbols)
+
+    # Symbols beside the header fill the rows to its right first. The rest
+    # continue in the full-width grid, counting the header's eight symbols as
+    # occupied cells (which need not line up with the header for shapes other
+    # than two_square).
+    self._stamp(canvas, 0, 8, _num_header_row_symbols_wide, 0,
+                signals[:num_header_row_symbols], labels)
+    self._stamp(canvas, 0, 0, new_image_num_symbols_width,
+                num_header_row_symbols + 8, signals[num_header_row_symbols:],
+                labels)
+    self.completed = len(payload)
+
+    self.result = Image.fromarray(
+      numpy.repeat(canvas[:, :, numpy.newaxis], 3, axis=2), 'RGB')
 
 
   def decode(self, read_image):
+    if self.num_workers > 1:
+      self._parallel_decode(read_image)
+    else:
+      self.result = ''.join(self.decode_bands(read_image))
+
+  def decode_header(self, read_image):
+    # Decodes the header alone, which says how to decode the rest (see
+    # PayloadHeader), and returns it.
+    self._decode_header(self._box_reader(read_image)(self._HEADER_BOX))
+    return self.header
+
+  def decode_bands(self, read_image):
+    # Generator over the decoded payload, one band (a row of symbols) at a
+    # time, so callers can consume the payload while the rest of the image
+    # is still being decoded. Memory is bounded by the raster PIL decodes
+    # plus one band's pixels and intermediates: an unloaded image stored
+    # uncompressed (see _box_reader) is read a band at a time and never
+    # held whole, but PIL can only decode a JPEG or PNG whole, which costs
+    # 4 bytes a pixel in RGB (1 in L). The characters yielded are the
+    # caller's to keep or drop.
+    num_rows, num_columns = self._symbol_grid(read_image)
+    width = read_image.size[0]
+    shape_height = self.symbol_shape.get_shape_height()
+    band = self._box_reader(read_image)
+
+    self._decode_header(band(self._HEADER_BOX))
+
+    # Decode payload of image, skipping the symbols that start inside the
+    # header block.
+    confidences = []
+    for row in range(num_rows):
+      top = row * shape_height
+      decoded = _decode_stripe(band((0, top, width, top + shape_height)), row,
+                               self.symbol_shape, self.message_symbol_coder,
+                               self.symbol_signal_coder,
+                               with_confidence=self.with_confidence)
+      if self.with_confidence:
+        decoded, confidence = decoded
+        confidences.append(confidence)
+      yield decoded
+      self.completed += num_columns
+      self._report_progress()
+    if self.with_confidence:
+      self.confidence = _concatenate(confidences)
+
+  def _parallel_decode(self, read_image):
+    # Split the symbol rows into stripes decoded by a pool of processes. The
+    # raw raster is copied once into shared memory that every worker maps
+    # without pickling it.
+    num_rows, num_columns = self._symbol_grid(read_image)
+    self._load(read_image)
+    pixels = numpy.asarray(read_image.convert(self.decode_mode))
+
+    raster = RawArray('B', pixels.size)
+    rgb = numpy.frombuffer(raster, dtype=numpy.uint8).reshape(pixels.shape)
+    rgb[:] = pixels
+    del pixels
+
+    self._decode_header(rgb[:8, :8])
+
+    num_stripes = min(num_rows, self.num_workers * self.STRIPES_PER_WORKER)
+    bounds = [(num_rows * i) / num_stripes for i in range(num_stripes + 1)]
+    stripes = [(first_row, last_row - first_row)
+               for first_row, last_row in zip(bounds[:-1], bounds[1:])]
+    logging.info('Decoding %d stripes with %d workers.' % \
+                   (num_stripes, self.num_workers))
+
+    pool = multiprocessing.Pool(
+      self.num_workers, _init_stripe_worker,
+      (raster, rgb.shape, self.symbol_shape, self.message_symbol_coder,
+       self.symbol_signal_coder, self.with_confidence))
+    try:
+      decoded = pool.map(_decode_shared_stripe, stripes)
+    finally:
+      pool.close()
+      pool.join()
+
+    self.completed += num_rows * num_columns
+    if self.with_confidence:
+      decoded, confidences = zip(*decoded)
+      self.confidence = _concatenate(confidences)
+    self.result = ''.join(decoded)
+
+  def _box_reader(self, read_image):
+    # Function returning the pixels of a box of read_image as an array in
+    # decode_mode. The rows of an unloaded image stored uncompressed in one
+    # piece (PPM, BMP, TGA, single strip TIFF) are read from its file as
+    # they are asked for; anything else is loaded whole, once.
+    width, height = read_image.size
+    # Only images opened from a file have tiles, and only until loaded.
+    tile = getattr(read_image, 'tile', None) or []
+    if read_image.im is None and read_image.fp is not None and \
+          read_image.mode in ('L', 'RGB') and len(tile) == 1:
+      decoder, extent, offset, args = tile[0]
+      if decoder == 'raw' and extent == (0, 0, width, height) and \
+            isinstance(args, tuple) and len(args) == 3 and \
+            args[0] in self._RAW_PIXEL_BYTES and args[2] in (1, -1):
+        rawmode, stride, orientation = args
+        stride = stride or width * self._RAW_PIXEL_BYTES[rawmode]
+
+        def read_rows(box):
+          left, top, right, bottom = box
+          # Bottom-up files (orientation -1) store the last row first.
+          if orientation == 1:
+            read_image.fp.seek(offset + top * stride)
+          else:
+            read_image.fp.seek(offset + (height - bottom) * stride)
+          rows = Image.frombytes(
+            read_image.mode, (width, bottom - top),
+            read_image.fp.read((bottom - top) * stride), 'raw', rawmode,
+            stride, orientation)
+          return numpy.asarray(rows.crop((left, 0, right, bottom - top))
+                               .convert(self.decode_mode))
+        return read_rows
+
+    self._load(read_image)
+
+    def crop(box):
+      # Ensure format is correct.
+      return numpy.asarray(read_image.crop(box).convert(self.decode_mode))
+    return crop
+
+  def _load(self, read_image):
+    # For luminance decoding of a JPEG, have libjpeg emit the Y channel
+    # alone, skipping chroma upsampling and color conversion. This only takes
+    # effect before the image is loaded.
+    if self.decode_mode == 'L' and read_image.format == 'JPEG':
+      read_image.draft('L', read_image.size)
+    read_image.load()
+
+  def _symbol_grid(self, read_image):
+    # Number of symbol rows and columns in an image to decode.
     width, height = read_image.size
-    image = read_image.convert('RGB') # Ensure format is correct.
-
     shape_width, shape_height = self.symbol_shape.get_shape_size()
-    pixels = image.load()
-
-    _num_symbol_shapes = self.symbol_shape.get_num_symbol_shapes()
-    _symbol_to_message = self.message_symbol_coder.symbol_to_message
-    _signal_to_symbol = self.symbol_signal_coder.signal_to_symbol
-    _get_symbol_shape_coords = self.symbol_shape.get_symbol_shape_coords
-
-    def rgb_to_lum(rgb):
-      red, green, blue = rgb
-      lum = 0.299 * red + 0.587 * green + 0.114 * blue
-      return lum
-
-    # Decode the header.
-    _header_message_symbol = Base64MessageSymbolCoder()
-    _header_signal_symbol = Base64SymbolSignalCoder()
-    _header = ''
-    for head_row in range(0, 8, 2):
-      for head_col in range(0, 8, 4):
-        values = {}
-        for signal_val in range(2):
-          coords = two_square.get_symbol_shape_coords(signal_val+1)
-          values[signal_val] = {}
-          for x,y in coords:
-            values[signal_val][(x,y)] = pixels[head_col + x, head_row + y]
-        message = _header_message_symbol.symbol_to_message(
-          _header_signal_symbol.signal_to_symbol(values))
-        _header += message
-
-    logging.info('Extracted header: %s.' % _header)
-
+    if width % shape_width or height % shape_height:
+      raise IndexError('image index out of range')
     self.data_length = (height * width) / (shape_width * shape_height)
-
-    # Decode payload of image.
-    extracted_data = ''
-    for y_coord in range(0, height, shape_height):
-      for x_coord in range(0, width, shape_width):
-        self.completed += 1
-        if y_coord < 8 and x_coord < 8:
-          continue
-
-        values = {}
-        for symbol_val in range(_num_symbol_shapes):
-          coords = _get_symbol_shape_coords(symbol_val+1)
-          values[symbol_val] = {}
-          for x,y in coords:
-            values[symbol_val][(x,y)] = pixels[x_coord + x, y_coord + y]
-
-        extracted_datum = _symbol_to_message(_signal_to_symbol(values))
-        extracted_data += extracted_datum
-    self.result = extracted_data
+    return height / shape_height, width / shape_width
+
+  def _decode_header(self, rgb):
+    # The header always uses two_square symbols in the upper-left 8x8 block.
+    self.header = _decode_stripe(rgb, 0, two_square, Base64MessageSymbolCoder(),
+                                 Base64SymbolSignalCoder(), skip_header=False)
+    logging.info('Extracted header: %s.' % self.header)
+
+
+def _symbol_means(plane, symbol_shape, num_rows, num_columns):
+  # Mean value of every symbol in a (num_rows x num_columns) grid of shape
+  # cells, as an array indexed [row, column, symbol].
+  shape_width, shape_height = symbol_shape.get_shape_size()
+  num_symbol_shapes = symbol_shape.get_num_symbol_shapes()
+  cells = plane[:num_rows * shape_height, :num_columns * shape_width]
+  cells = cells.reshape(num_rows, shape_height, num_columns, shape_width)
+
+  means = numpy.empty((num_rows, num_columns, num_symbol_shapes))
+  for sym_i in range(num_symbol_shapes):
+    ys, xs = symbol_shape.get_symbol_offsets(sym_i + 1)
+    # Accumulate one pixel offset at a time, in the shape's order, so means
+    # landing exactly between two thresholds always round the same way.
+    total = 0
+    for y, x in zip(ys, xs):
+      total = total + cells[:, y, :, x]
+    means[:, :, sym_i] = total / len(ys)
+  return means
+
+
+def _decode_stripe(rgb, first_row, symbol_shape, message_symbol_coder,
+                   symbol_signal_coder, skip_header=True,
+                   with_confidence=False):
+  # Decode a (height, width, 3) RGB or (height, width) luminance stripe of
+  # whole symbol rows, the first of which is symbol row first_row of the image,
+  # into message characters in raster order. With with_confidence, returns
+  # the characters and the array of their confidences.
+  shape_width, shape_height = symbol_shape.get_shape_size()
+  num_rows = rgb.shape[0] / shape_height
+  num_columns = rgb.shape[1] / shape_width
+
+  if rgb.ndim == 2:
+    plane = rgb.astype(numpy.float64)
+  else:
+    # Average of the three channels of each pixel.
+    plane = rgb.sum(axis=2) / 3.
+  means = _symbol_means(plane, symbol_shape, num_rows, num_columns)
+
+  # Skip the symbols that start inside the header block.
+  in_payload = numpy.ones((num_rows, num_columns), dtype=bool)
+  if skip_header:
+    header_rows = -(-8 // shape_height) - first_row
+    if header_rows > 0:
+      in_payload[:header_rows, :-(-8 // shape_width)] = False
+
+  means = means[in_payload]
+  symbols = symbol_signal_coder.decode_many(means)
+  decoded = message_symbol_coder.decode_many(symbols)
+  if not with_confidence:
+    return decoded
+  return decoded, message_symbol_coder.confidence_many(
+    symbols, symbol_signal_coder.confidence_many(means))
+
+
+def _concatenate(confidences):
+  if not confidences:
+    return numpy.zeros(0)
+  return numpy.concatenate(confidences)
+
+
+# State of a stripe decoding worker process, set once by _init_stripe_worker.
+_stripe_worker = {}
+
+def _init_stripe_worker(raster, shape, symbol_shape, message_symbol_coder,
+                        symbol_signal_coder, with_confidence):
+  _stripe_worker['rgb'] = numpy.frombuffer(raster, dtype=numpy.uint8).reshape(
+    shape)
+  _stripe_worker['coders'] = (symbol_shape, message_symbol_coder,
+                              symbol_signal_coder)
+  _stripe_worker['with_confidence'] = with_confidence
+
+def _decode_shared_stripe(stripe):
+  first_row, num_rows = stripe
+  symbol_shape = _stripe_worker['coders'][0]
+  shape_height = symbol_shape.get_shape_height()
+  rgb = _stripe_worker['rgb'][first_row * shape_height:
+                              (first_row + num_rows) * shape_height]
+  return _decode_stripe(rgb, first_row, *_stripe_worker['coders'],
+                        with_confidence=_stripe_worker['with_confidence'])
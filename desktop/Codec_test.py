@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+from Codec import Codec
+from ImageCoder import Base64MessageSymbolCoder, Base64SymbolSignalCoder
+from PIL import Image
+import cStringIO
+from SymbolShape import two_square, four_square, two_by_four
+import unittest
+
+class CodecEncodeTest(unittest.TestCase):
+  def setUp(self):
+    self.codec = Codec(two_square, 1.0, Base64MessageSymbolCoder(),
+                       Base64SymbolSignalCoder())
+    self.data = 'aesthete' + 'AB/9' * 40
+    self.codec.encode(self.data)
+    self.image = self.codec.get_result()
+    self.pixels = self.image.load()
+
+  def test_image_format(self):
+    self.assertEqual('RGB', self.image.mode)
+    self.assertEqual(
+      self.codec.get_prospective_image_dimensions(self.data), self.image.size)
+
+  def test_header(self):
+    # 'a' is base64 index 26, octal 32; 'e' is index 30, octal 36.
+    self.assertEqual((154, 154, 154), self.pixels[0, 0])
+    self.assertEqual((154, 154, 154), self.pixels[1, 1])
+    self.assertEqual((182, 182, 182), self.pixels[2, 0])
+    self.assertEqual((182, 182, 182), self.pixels[3, 1])
+    self.assertEqual((154, 154, 154), self.pixels[4, 0])
+    self.assertEqual((70, 70, 70), self.pixels[6, 0])
+
+  def test_payload_beside_header(self):
+    # 'A' is index 0 and '/' is index 63 (octal 77).
+    self.assertEqual((238, 238, 238), self.pixels[8, 0])
+    self.assertEqual((238, 238, 238), self.pixels[11, 1])
+    self.assertEqual((42, 42, 42), self.pixels[16, 0])
+    self.assertEqual((42, 42, 42), self.pixels[19, 1])
+
+  def test_unused_symbols_are_black(self):
+    width, height = self.image.size
+    self.assertEqual((0, 0, 0), self.pixels[width - 1, height - 1])
+
+
+class CodecDecodeTest(unittest.TestCase):
+  def setUp(self):
+    self.codec = Codec(two_square, 1.5, Base64MessageSymbolCoder(),
+                       Base64SymbolSignalCoder())
+    self.payload = Base64MessageSymbolCoder.values
+
+  def test_round_trip(self):
+    self.codec.encode('aesthete' + self.payload)
+    self.codec.decode(self.codec.get_result())
+    self.assertEqual(self.payload, self.codec.get_result())
+
+  def test_round_trip_other_shapes(self):
+    for symbol_shape in (four_square, two_by_four):
+      codec = Codec(symbol_shape, 1.5, Base64MessageSymbolCoder(),
+                    Base64SymbolSignalCoder())
+      codec.encode('aesthete' + self.payload)
+      codec.decode(codec.get_result())
+      self.assertEqual(self.payload, codec.get_result())
+
+  def test_parallel_decode(self):
+    self.codec.encode('aesthete' + self.payload * 20)
+    image = self.codec.get_result()
+    self.codec.decode(image)
+    serial = self.codec.get_result()
+
+    codec = Codec(two_square, 1.5, Base64MessageSymbolCoder(),
+                  Base64SymbolSignalCoder(), num_workers=2)
+    codec.decode(image)
+    self.assertEqual(serial, codec.get_result())
+
+  def test_decode_bands(self):
+    self.codec.encode('aesthete' + self.payload * 20)
+    bands = list(self.codec.decode_bands(self.codec.get_result()))
+    self.assertEqual('aesthete', self.codec.header)
+    self.assertEqual(self.codec.get_result().size[1] / 2, len(bands))
+    self.assertEqual(self.payload * 20, ''.join(bands))
+
+  def test_decode_uncompressed_bands(self):
+    # Rows of uncompressed images are read from the file a band at a time,
+    # top-down (PPM, TIFF) or bottom-up (BMP, TGA), without loading them.
+    self.codec.encode('aesthete' + self.payload * 20)
+    image = self.codec.get_result()
+    for image_format in ('PPM', 'TIFF', 'BMP', 'TGA'):
+      for mode in ('RGB', 'L'):
+        stored = cStringIO.StringIO()
+        image.convert(mode).save(stored, image_format)
+        stored.seek(0)
+        read_image = Image.open(stored)
+        bands = list(self.codec.decode_bands(read_image))
+        self.assertEqual(None, read_image.im)
+        self.assertEqual('aesthete', self.codec.header)
+        self.assertEqual(self.payload * 20, ''.join(bands))
+
+  def test_decode_header(self):
+    self.codec.encode('CIAAAAQa' + self.payload)
+    codec = Codec(four_square, 1.5, Base64MessageSymbolCoder(),
+                  Base64SymbolSignalCoder())
+    self.assertEqual('CIAAAAQa', codec.decode_header(self.codec.get_result()))
+    self.assertEqual(None, codec.get_result())
+
+  def test_ties_round_up(self):
+    # A gray of 28 sits exactly between the '7' (42) and '8' (14) thresholds.
+    self.codec.encode('aesthete' + self.payload)
+    image = self.codec.get_result()
+    pixels = image.load()
+    for x in range(8, 12):
+      for y in range(2):
+        pixels[x, y] = (28, 28, 28)
+    self.codec.decode(image)
+    self.assertEqual('/' + self.payload[1:], self.codec.get_result())
+
+  def test_luminance_decode_matches_rgb(self):
+    self.codec.encode('aesthete' + self.payload * 20)
+    jpeg = cStringIO.StringIO()
+    self.codec.get_result().save(jpeg, 'JPEG', quality=70)
+
+    decoded = []
+    for decode_mode, num_workers in (('RGB', 1), ('L', 1), ('L', 2)):
+      codec = Codec(two_square, 1.5, Base64MessageSymbolCoder(),
+                    Base64SymbolSignalCoder(), num_workers=num_workers,
+                    decode_mode=decode_mode)
+      jpeg.seek(0)
+      read_image = Image.open(jpeg)
+      codec.decode(read_image)
+      self.assertEqual('aesthete', codec.header)
+      decoded.append(codec.get_result())
+    self.assertEqual('L', read_image.mode)
+    self.assertEqual(decoded[0], decoded[1])
+    self.assertEqual(decoded[0], decoded[2])
+
+  def test_confidence(self):
+    self.codec.encode('aesthete' + self.payload * 20)
+    image = self.codec.get_result()
+    pixels = image.load()
+    # Nudge the first character's symbols toward their neighbors: 'A' reads
+    # as 0 (238), so 232 is still 'A' but less certainly.
+    for x in range(8, 12):
+      for y in range(2):
+        pixels[x, y] = (232, 232, 232)
+
+    for num_workers in (1, 2):
+      codec = Codec(two_square, 1.5, Base64MessageSymbolCoder(),
+                    Base64SymbolSignalCoder(), num_workers=num_workers,
+                    with_confidence=True)
+      codec.decode(image)
+      self.assertEqual(self.payload * 20, codec.get_result())
+      self.assertEqual(len(codec.get_result()), len(codec.confidence))
+      self.assertAlmostEqual(1 - 6 / 14., codec.confidence[0])
+      self.assertTrue((codec.confidence[1:] == 1).all())
+
+  def test_signal_confidence(self):
+    coder = Base64SymbolSignalCoder()
+    self.assertEqual([1, 1, 1, .5, 0, 0.5, 1],
+                     list(coder.confidence_many([0, 14, 42, 49, 56, 63, 255])))
+
+
+class CodecJobTest(unittest.TestCase):
+  def setUp(self):
+    self.codec = Codec(two_square, 1.5, Base64MessageSymbolCoder(),
+                       Base64SymbolSignalCoder())
+    self.payload = Base64MessageSymbolCoder.values * 20
+
+  def test_submit_round_trip(self):
+    progress = []
+    image = self.codec.submit('encode', 'aesthete' + self.payload,
+                              progress_callback=progress.append).result(10)
+    self.assertEqual(1.0, progress[-1])
+
+    job = self.codec.submit('decode', image, progress_interval=0)
+    finished = []
+    job.add_done_callback(finished.append)
+    self.assertEqual(self.payload, job.result(10))
+    self.assertTrue(job.done())
+    self.assertEqual([job], finished)
+
+  def test_submit_failure(self):
+    job = self.codec.submit('decode', Image.new('RGB', (9, 9)))
+    self.assertRaises(IndexError, job.result, 10)
+    self.assertTrue(isinstance(job.exception(), IndexError))
+
+  def test_failing_progress_callback(self):
+    def fail_at_end(fraction):
+      if fraction == 1.0:
+        raise ValueError(fraction)
+    job = self.codec.submit('encode', 'aesthete' + self.payload,
+                            progress_callback=fail_at_end)
+    self.assertRaises(ValueError, job.result, 10)
+
+  def test_concurrent_submits(self):
+    payloads = [self.payload[i:] + self.payload[:i] for i in range(6)]
+    images = [job.result(10) for job in
+              [self.codec.submit('encode', 'aesthete' + payload)
+               for payload in payloads]]
+    jobs = [self.codec.submit('decode', image) for image in images]
+    self.assertEqual(payloads, [job.result(10) for job in jobs])
+    self.assertEqual(['aesthete'] * 6, [job.header for job in jobs])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 
 # User-friendly SeeMeNot application code. Supports Drag and Drop.
-from Cipher.PyV8Cipher import V8Cipher as Cipher
+from Cipher.SJCLCipher import SJCLCipher as Cipher
 from Codec import Codec
 from Encryptor import Encrypt
 from ImageCoder import Base64MessageSymbolCoder, Base64SymbolSignalCoder
@@ -288,20 +288,16 @@ class GuiCodec(threading.Thread):
 
     logging.info('Encrypted data length: %d.' % len(encrypted_data))
 
-    # TODO(tierney): Set the "header" more flexibly/appropriately.
-    header = 'aesthete'
-    self.codec.set_direction('encode')
-    self.codec.set_data(header + encrypted_data)
-    self.codec.start()
-    while True:
-      im = self.codec.get_result()
-      if im:
-        break
-
+    def record_progress(percent):
       # Recording the image progress for the user.
-      _PROGRESS[image_path] = self.codec.get_percent_complete()
-      logging.info('Progress: %.2f%%.' % (100. * self.codec.get_percent_complete()))
-      time.sleep(0.5)
+      _PROGRESS[image_path] = percent
+      logging.info('Progress: %.2f%%.' % (100. * percent))
+    try:
+      im = self.codec.submit('encode', crypto.payload(encrypted_data),
+                             progress_callback=record_progress).result()
+    except Exception, e:
+      logging.error(str(e))
+      return -1
 
     quality = 95
     logging.info('Saving encrypted jpeg with quality %d.' % quality)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# Picks Reed-Solomon parameters for a payload from measured channel error
+# rates. The channel (Codec with a symbol shape, then a JPEG at a quality) is
+# measured once by round-tripping random payloads through PIL's JPEG encoder
+# and decoder, and the statistics are cached on disk. With the codewords
+# interleaved to full depth (see Interleaver), byte errors land in codewords
+# independently, so the errors in a codeword are binomial and the least
+# parity meeting a target failure probability follows in closed form.
+
+from Codec import Codec
+from ECCoder import ECCoder
+from ImageCoder import Base64MessageSymbolCoder, Base64SymbolSignalCoder
+from Interleaver import Interleaver
+from PayloadHeader import PayloadHeader
+from PIL import Image
+from SymbolShape import AVAILABLE_SHAPES
+import argparse
+import base64
+import cStringIO
+import json
+import logging
+import math
+import os
+import random
+import sys
+
+STATS_PATH = os.path.expanduser('~/.cryptogram_channel_stats.json')
+
+# Measurement payload: trials of this many random bytes each.
+MEASURE_BYTES = 60000
+MEASURE_TRIALS = 3
+
+# Errors added to the measured count before estimating the byte error rate.
+# With none seen in N bytes, 3 / N is the 95% upper bound on the rate (the
+# rule of three), so a clean measurement still buys some parity.
+PRIOR_ERRORS = 3
+
+
+def measure(shape_name, quality, decode_mode='RGB', trials=MEASURE_TRIALS,
+            length=MEASURE_BYTES, seed=0):
+  # Round trips random payloads through Codec and a JPEG of the given
+  # quality, counting the bytes decoded wrongly and the trials that lost
+  # their alignment (misread symbols dropped or added), which no ECC can
+  # repair.
+  generator = random.Random(seed)
+  symbol_shape = AVAILABLE_SHAPES[shape_name]
+  stats = {'bytes': 0, 'byte_errors': 0, 'trials': trials, 'desyncs': 0}
+  for _ in range(trials):
+    data = ''.join(chr(generator.randint(0, 255)) for _ in xrange(length))
+    payload = base64.b64encode(data)
+    codec = Codec(symbol_shape, 1.0, Base64MessageSymbolCoder(),
+                  Base64SymbolSignalCoder())
+    codec.encode(PayloadHeader.LEGACY + payload)
+    jpeg = cStringIO.StringIO()
+    codec.get_result().save(jpeg, 'JPEG', quality=quality)
+    jpeg.seek(0)
+
+    codec = Codec(symbol_shape, 1.0, Base64MessageSymbolCoder(),
+                  Base64SymbolSignalCoder(), decode_mode=decode_mode)
+    codec.decode(Image.open(jpeg))
+    decoded = codec.get_result()[:len(payload)]
+    if len(decoded) != len(payload):
+      stats['desyncs'] += 1
+      continue
+    stats['bytes'] += length
+    stats['byte_errors'] += sum(
+      1 for a, b in zip(base64.b64decode(decoded), data) if a != b)
+  return stats
+
+
+def _key(shape_name, quality, decode_mode):
+  return '%s/%d/%s' % (shape_name, quality, decode_mode)
+
+
+def load_stats(path=STATS_PATH):
+  if not os.path.exists(path):
+    return {}
+  with open(path) as fh:
+    return json.load(fh)
+
+
+def save_stats(stats, path=STATS_PATH):
+  # Written to a temporary file and renamed, so a reader never sees half of
+  # it.
+  temporary = path + '.tmp'
+  with open(temporary, 'w') as fh:
+    json.dump(stats, fh, indent=2, sort_keys=True)
+  os.rename(temporary, path)
+
+
+def channel_stats(shape_name, quality, decode_mode='RGB', path=STATS_PATH):
+  # The cached statistics for the channel, measured (and cached) on first
+  # use.
+  stats = load_stats(path)
+  key = _key(shape_name, quality, decode_mode)
+  if key not in stats:
+    logging.info('Measuring channel %s.' % key)
+    stats[key] = measure(shape_name, quality, decode_mode)
+    save_stats(stats, path)
+  return stats[key]
+
+
+def byte_error_rate(stats):
+  return (stats['byte_errors'] + PRIOR_ERRORS) / float(max(stats['bytes'], 1))
+
+
+def codeword_failure_probability(n, k, p):
+  # Probability that more than (n-k)/2 of n bytes, each wrong with
+  # probability p, are wrong.
+  if p <= 0:
+    return 0.
+  if p >= 1:
+    return 1.
+  capacity = (n - k) // 2
+  log_p, log_q = math.log(p), math.log1p(-p)
+  success = 0.
+  for errors in range(capacity + 1):
+    success += math.exp(math.lgamma(n + 1) - math.lgamma(errors + 1) -
+                        math.lgamma(n - errors + 1) + errors * log_p +
+                        (n - errors) * log_q)
+  return max(0., 1. - success)
+
+
+def failure_probability(n, k, p, payload_length):
+  # Probability that some codeword of a payload_length byte payload fails.
+  num_codewords = max(1, -(-payload_length // k))
+  return 1. - (1. - codeword_failure_probability(n, k, p)) ** num_codewords
+
+
+def plan(payload_length, shape_name, quality, target=1e-6, n=255,
+         decode_mode='RGB', num_threads=1, path=STATS_PATH):
+  # The ECCoder with the least parity whose payload fails with probability
+  # at most target over the measured channel, interleaved to full depth. A
+  # payload shorter than the k of an n byte code takes the code shortened to
+  # fit it, k its length and n = k + parity, instead of padding out to n.
+  # Raises ValueError if the channel loses alignment, which parity cannot
+  # fix, or if no code of length n is good enough.
+  stats = channel_stats(shape_name, quality, decode_mode, path)
+  if stats['desyncs']:
+    raise ValueError('%s at quality %d loses alignment in %d of %d trials.' %
+                     (shape_name, quality, stats['desyncs'], stats['trials']))
+  p = byte_error_rate(stats)
+  for parity in range(2, n, 2):
+    k = min(n - parity, max(payload_length, 1))
+    if failure_probability(k + parity, k, p, payload_length) <= target:
+      num_codewords = max(1, -(-payload_length // k))
+      depth = min(num_codewords, Interleaver.MAX_DEPTH)
+      return ECCoder(k + parity, k, num_threads, depth)
+  raise ValueError('No %d byte code meets a failure probability of %g at a '
+                   'byte error rate of %g.' % (n, target, p))
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(
+    prog='ECCPlanner', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument('-l', '--length', type=int, required=True,
+                      help='Payload length in bytes.')
+  parser.add_argument('-s', '--shape', type=str, default='two_square',
+                      choices=sorted(AVAILABLE_SHAPES),
+                      help='SymbolShape of the image.')
+  parser.add_argument('-q', '--quality', type=int, default=95,
+                      help='JPEG quality the image will be stored at.')
+  parser.add_argument('-m', '--decode_mode', type=str, default='RGB',
+                      choices=Codec.DECODE_MODES,
+                      help='Pixel format the image will be decoded from.')
+  parser.add_argument('-t', '--target', type=float, default=1e-6,
+                      help='Acceptable probability of losing the payload.')
+  parser.add_argument('-p', '--path', type=str, default=STATS_PATH,
+                      help='Channel statistics cache.')
+  FLAGS = parser.parse_args(argv[1:])
+
+  try:
+    coder = plan(FLAGS.length, FLAGS.shape, FLAGS.quality, FLAGS.target,
+                 decode_mode=FLAGS.decode_mode, path=FLAGS.path)
+  except ValueError, e:
+    logging.error(e)
+    return 1
+  n, k = coder.codeword_length, coder.message_byte_length
+  print json.dumps({
+    'n': n, 'k': k, 'interleave_depth': coder.interleaver.depth,
+    'overhead': float(n) / k,
+    'byte_error_rate': byte_error_rate(
+      channel_stats(FLAGS.shape, FLAGS.quality, FLAGS.decode_mode,
+                    FLAGS.path)),
+  }, indent=2, sort_keys=True)
+  return 0
+
+
+if __name__ == '__main__':
+  logging.basicConfig(stream=sys.stderr, level=logging.INFO,
+                      format='%(asctime)-15s %(levelname)8s %(module)10s '\
+                        '%(lineno)4d %(message)s')
+  sys.exit(main(sys.argv))
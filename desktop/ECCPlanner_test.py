@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import ECCPlanner
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+class ECCPlannerTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'stats.json')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def write_stats(self, **stats):
+    key = ECCPlanner._key('two_square', 80, 'RGB')
+    ECCPlanner.save_stats({key: dict(
+      {'bytes': 10 ** 6, 'byte_errors': 0, 'trials': 3, 'desyncs': 0},
+      **stats)}, self.path)
+
+  def test_failure_probability(self):
+    self.assertEqual(0., ECCPlanner.failure_probability(255, 223, 0., 10 ** 6))
+    self.assertEqual(1., ECCPlanner.failure_probability(255, 223, 1., 10))
+    # More parity, fewer failures; more codewords, more.
+    rates = [ECCPlanner.failure_probability(255, k, 1e-2, 10 ** 5)
+             for k in (251, 239, 223, 191)]
+    self.assertEqual(sorted(rates, reverse=True), rates)
+    self.assertTrue(ECCPlanner.failure_probability(255, 223, 1e-2, 10 ** 6) >
+                    ECCPlanner.failure_probability(255, 223, 1e-2, 10 ** 3))
+    # One byte, wrong with probability p, in a code with no parity to spare.
+    self.assertAlmostEqual(
+      0.01, ECCPlanner.codeword_failure_probability(1, 1, 0.01))
+
+  def test_plan(self):
+    self.write_stats()
+    coder = ECCPlanner.plan(10 ** 5, 'two_square', 80, path=self.path)
+    n, k = coder.codeword_length, coder.message_byte_length
+    self.assertEqual(255, n)
+    self.assertTrue(ECCPlanner.failure_probability(
+      n, k, ECCPlanner.byte_error_rate(
+        ECCPlanner.channel_stats('two_square', 80, path=self.path)),
+      10 ** 5) <= 1e-6)
+    # The least parity: two bytes fewer is not enough.
+    self.assertTrue(ECCPlanner.failure_probability(
+      n, k + 2, 3e-6, 10 ** 5) > 1e-6)
+    self.assertEqual(-(-10 ** 5 // k), coder.interleaver.depth)
+
+    self.write_stats(byte_errors=10 ** 4)
+    noisy = ECCPlanner.plan(10 ** 5, 'two_square', 80, path=self.path)
+    self.assertTrue(noisy.message_byte_length < k)
+
+  def test_plan_short(self):
+    # Shorter than a codeword: a shortened code, no padding.
+    self.write_stats()
+    coder = ECCPlanner.plan(100, 'two_square', 80, path=self.path)
+    n, k = coder.codeword_length, coder.message_byte_length
+    self.assertEqual(100, k)
+    self.assertTrue(100 < n < 255)
+    self.assertEqual(1, coder.interleaver.depth)
+    self.assertEqual(k, len(coder.decode(coder.encode('x' * 100))))
+    self.assertEqual(n, len(coder.encode('x' * 100)))
+    # No more parity than the full length code needs.
+    full = ECCPlanner.plan(10 ** 5, 'two_square', 80, path=self.path)
+    self.assertTrue(n - k <= full.codeword_length - full.message_byte_length)
+
+  def test_desync(self):
+    self.write_stats(desyncs=1)
+    self.assertRaises(ValueError, ECCPlanner.plan, 1000, 'two_square', 80,
+                      path=self.path)
+
+  def test_measure_and_cache(self):
+    stats = ECCPlanner.channel_stats('two_square', 90, path=self.path)
+    self.assertEqual(0, stats['desyncs'])
+    self.assertEqual(ECCPlanner.MEASURE_TRIALS * ECCPlanner.MEASURE_BYTES,
+                     stats['bytes'])
+    with open(self.path) as fh:
+      self.assertEqual({ECCPlanner._key('two_square', 90, 'RGB'): stats},
+                       json.load(fh))
+
+
+if __name__ == '__main__':
+  unittest.main()
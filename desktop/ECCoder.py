@@ -1,35 +1,95 @@
 #!/usr/bin/env python
+from Interleaver import Interleaver
+import atexit
+import mmap
+import multiprocessing
+import numpy
+import os
 import rs
-import threading
-
-class ECCodeRunner(threading.Thread):
-  PADDING = '}'
-
-  def __init__(self, coder, in_queue, out_queue):
-    self.coder = coder
-    self.in_queue = in_queue
-    self.out_queue = out_queue
-    threading.Thread.__init__(self)
-
-  def run(self):
-    for order, encode, block in self.in_queue:
-      #logging.info('%s %d.' % ('Encoding' if encode else 'Decoding', order))
-      if encode:
-        coded_block = self.coder.encode(block)
-      else:
-        coded_block = self.coder.decode(block).rstrip(self.PADDING)
-      self.out_queue.put((order, coded_block))
-    return
+import tempfile
+
+# Where to put the buffers shared with worker processes; memory-backed if
+# possible.
+_SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Persistent worker pools, one per number of workers, shared by every code
+# and closed at exit.
+_pools = {}
+
+def _pool(num_workers):
+  if num_workers not in _pools:
+    _pools[num_workers] = multiprocessing.Pool(num_workers)
+  return _pools[num_workers]
+
+def _close_pools():
+  for pool in _pools.values():
+    pool.terminate()
+    pool.join()
+  _pools.clear()
+
+atexit.register(_close_pools)
+
+
+# Warm RSCoders of an ECC worker process, by (n, k).
+_worker_coders = {}
+
+def _worker_coder(n, k):
+  if (n, k) not in _worker_coders:
+    _worker_coders[n, k] = rs.RSCoder(n, k)
+  return _worker_coders[n, k]
+
+def _code_range(task):
+  # Code blocks [first, last) of the shared buffer at path with the (n, k)
+  # code, writing the result into the buffer's output region at the blocks'
+  # offset. When decoding with confidence, the buffer also holds a byte of
+  # it per codeword byte at confidence_offset.
+  n, k, path, to_encode, first, last, output_offset, confidence_offset = task
+  coder = _worker_coder(n, k)
+  if to_encode:
+    in_length, out_length, code = coder.k, coder.n, coder.encode_many
+  else:
+    in_length, out_length, code = coder.n, coder.k, coder.decode_many
+
+  with open(path, 'r+b') as fh:
+    buf = mmap.mmap(fh.fileno(), 0)
+  try:
+    blocks = numpy.frombuffer(buf, dtype=numpy.uint8,
+                              count=(last - first) * in_length,
+                              offset=first * in_length)
+    blocks = blocks.reshape(last - first, in_length)
+    if confidence_offset is None:
+      coded = code(blocks).tostring()
+    else:
+      confidence = numpy.frombuffer(
+        buf, dtype=numpy.uint8, count=blocks.size,
+        offset=confidence_offset + first * in_length)
+      coded = coder.decode_many_soft(
+        blocks, confidence.reshape(blocks.shape)).tostring()
+      del confidence
+    del blocks
+    start = output_offset + first * out_length
+    buf[start:start + len(coded)] = coded
+  finally:
+    buf.close()
 
 
 class ECCoder(object):
   PADDING = '}'
 
-  def __init__(self, n, k, num_threads=1):
+  # Fewest blocks per worker process that are worth handing to the pool.
+  MIN_BLOCKS_PER_WORKER = 16
+
+  # Block ranges handed to each worker process, to even out the load.
+  RANGES_PER_WORKER = 4
+
+  def __init__(self, n, k, num_threads=1, interleave_depth=1):
     self.codeword_length = n
     self.message_byte_length = k
+    # Despite the name, these are worker processes.
     self.num_threads = num_threads
     self.coder = rs.RSCoder(self.codeword_length, self.message_byte_length)
+    # Encoded codewords are interleaved to this depth (see Interleaver).
+    self.interleaver = Interleaver(n, interleave_depth)
 
   def _pad(self, s):
     if len(s) == self.message_byte_length:
@@ -54,55 +114,111 @@ class ECCoder(object):
 
     return tuple(chunked)
 
-  def _threaded_coder(self, message, to_encode):
-    blocks = self._chunk(message, to_encode)
-    to_code = [(i, to_encode, block) for i, block in enumerate(blocks)]
-    num_blocks = int(math.ceil(len(to_code) / (1. * self.num_threads)))
-
-    to_code_list = [to_code[i:i+num_blocks] for i in
-                    range(0, len(to_code), num_blocks)]
-
-    coded_queue = Queue.Queue()
-    threads = []
-    for i in range(FLAGS.threads):
-      new_encoder = rs.RSCoder(self.codeword_length, self.message_byte_length)
-      threads.append(ECCodeRunner(new_encoder, to_code_list[i], coded_queue))
-
-    [t.start() for t in threads]
-    [t.join() for t in threads]
+  def _code(self, blocks, to_encode, confidence=None):
+    # The blocks coded back to back: n byte codewords when encoding, k byte
+    # messages when decoding. Every block is coded at once with
+    # RSCoder.encode_many/decode_many (decode_many_soft given the blocks'
+    # confidence), in this process or in the pool.
+    if not blocks:
+      return ''
+    if self.num_threads > 1 and \
+          len(blocks) >= self.num_threads * self.MIN_BLOCKS_PER_WORKER:
+      return self._parallel_code(blocks, to_encode, confidence)
+
+    coded = numpy.frombuffer(''.join(blocks), dtype=numpy.uint8).reshape(
+      len(blocks), len(blocks[0]))
+    if to_encode:
+      return self.coder.encode_many(coded).tostring()
+    if confidence is not None:
+      return self.coder.decode_many_soft(
+        coded, confidence.reshape(coded.shape)).tostring()
+    return self.coder.decode_many(coded).tostring()
+
+  def _parallel_code(self, blocks, to_encode, confidence=None):
+    # Split the blocks into contiguous ranges coded by the worker pool. Input
+    # and output share one mmap'd file: each worker reads its range from the
+    # input region and writes its output straight into the output region by
+    # offset, so no block data is pickled and nothing needs reordering.
+    n = self.codeword_length
+    k = self.message_byte_length
+    in_length, out_length = (k, n) if to_encode else (n, k)
+    num_blocks = len(blocks)
+    output_offset = confidence_offset = num_blocks * in_length
+    if confidence is None:
+      confidence_offset = None
+    else:
+      output_offset += confidence.size
 
-    coded_list = []
-    # print coded_queue
-    while True:
+    fd, path = tempfile.mkstemp(prefix='eccoder', dir=_SHARED_DIR)
+    try:
+      os.ftruncate(fd, output_offset + num_blocks * out_length)
+      buf = mmap.mmap(fd, 0)
       try:
-        dequeued = coded_queue.get_nowait()
-      except:
-        break
-      coded_list.append(dequeued)
-    coded_list.sort()
-
-    thread_coded = ''.join([e[1] for e in coded_list])
-    return thread_coded
-
-  def _single_coder(self, message, to_encode):
-    blocks = self._chunk(message, to_encode)
-    coded = ''
-    for block in blocks:
-      if to_encode:
-        coded_block = self.coder.encode(block)
-      else:
-        coded_block = self.coder.decode(block).rstrip(self.PADDING)
-      coded += coded_block
-    return coded
+        buf[:num_blocks * in_length] = ''.join(blocks)
+        if confidence is not None:
+          buf[confidence_offset:output_offset] = confidence.tostring()
+
+        num_ranges = min(num_blocks, self.num_threads * self.RANGES_PER_WORKER)
+        bounds = [(num_blocks * i) / num_ranges for i in range(num_ranges + 1)]
+        tasks = [(n, k, path, to_encode, first, last, output_offset,
+                  confidence_offset)
+                 for first, last in zip(bounds[:-1], bounds[1:])]
+        _pool(self.num_threads).map(_code_range, tasks)
+        return buf[output_offset:]
+      finally:
+        buf.close()
+    finally:
+      os.close(fd)
+      os.unlink(path)
 
   def encode(self, message):
-    if self.num_threads > 1:
-      return self._threaded_coder(message, True)
-    else:
-      return self._single_coder(message, True)
-
-  def decode(self, message):
-    if self.num_threads > 1:
-      return self._threaded_coder(message, False)
-    else:
-      return self._single_coder(message, False)
+    return self.interleaver.interleave(
+      self._code(self._chunk(message, True), True))
+
+  def decode(self, message, confidence=None):
+    # confidence, if given, rates each byte of message from 0 to 1 (such as
+    # Codec's, through util.base64_byte_confidence). Codewords with too many
+    # errors are then retried with their least confident bytes as erasures,
+    # which cost half the parity of errors.
+    n = self.codeword_length
+    if confidence is not None and len(confidence) != len(message):
+      raise ValueError('confidence must have one value per byte')
+    if self.interleaver.depth > 1:
+      # The interleaved layout follows from the coded length, a whole number
+      # of codewords. A message cut short (Codec never returns more than
+      # was painted) is padded back to it, so its bytes return to their
+      # codewords; the missing ones are errors, or erasures with confidence.
+      missing = -len(message) % n
+      message += '\0' * missing
+      if confidence is not None:
+        confidence = numpy.concatenate((confidence, numpy.zeros(missing)))
+    message = self.interleaver.deinterleave(message)
+    blocks = self._chunk(message, False)
+    if confidence is not None:
+      confidence = self.interleaver.deinterleave(confidence)
+      # Only the order matters, and a byte apiece is cheap to share.
+      confidence = numpy.round(
+        numpy.clip(confidence, 0, 1) * 255).astype(numpy.uint8)
+
+    # A truncated last codeword cannot join the batch.
+    tail = ''
+    if blocks and len(blocks[-1]) != n:
+      if confidence is None:
+        tail = self.coder.decode(blocks[-1])
+      else:
+        # Left padded with null bytes, like RSCoder.decode does.
+        padded = numpy.full(n, 255, dtype=numpy.uint8)
+        padded[n - len(blocks[-1]):] = confidence[len(message) -
+                                                  len(blocks[-1]):]
+        code = numpy.frombuffer(blocks[-1].rjust(n, '\0'), dtype=numpy.uint8)
+        tail = self.coder.decode_many_soft(
+          code[numpy.newaxis], padded[numpy.newaxis]).tostring().lstrip('\0')
+      tail = tail.rstrip(self.PADDING)
+      blocks = blocks[:-1]
+      if confidence is not None:
+        confidence = confidence[:len(blocks) * n]
+
+    decoded = self._code(blocks, False, confidence)
+    k = self.message_byte_length
+    return ''.join(decoded[i:i+k].lstrip('\0').rstrip(self.PADDING)
+                   for i in range(0, len(decoded), k)) + tail
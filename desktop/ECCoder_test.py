@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+from ECCoder import ECCoder, _pools
+import numpy
+import random
+import rs
+import unittest
+
+class ECCoderTest(unittest.TestCase):
+  def setUp(self):
+    self.random = random.Random(0)
+    self.coder = ECCoder(32, 16)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789+/'
+    self.message = ''.join(self.random.choice(alphabet) for _ in range(200))
+
+  def test_matches_block_coder(self):
+    coder = rs.RSCoder(32, 16)
+    encoded = self.coder.encode(self.message)
+    self.assertEqual(''.join(coder.encode(block) for block in
+                             self.coder._chunk(self.message, True)), encoded)
+    self.assertEqual(0, len(encoded) % 32)
+
+  def test_round_trip_with_errors(self):
+    encoded = bytearray(self.coder.encode(self.message))
+    for start in range(0, len(encoded), 32):
+      for position in self.random.sample(range(start, start + 32), 8):
+        encoded[position] ^= self.random.randint(1, 255)
+    self.assertEqual(self.message, self.coder.decode(str(encoded)))
+
+  def test_truncated_last_block(self):
+    encoded = self.coder.encode(self.message)
+    self.assertEqual(self.message[:192], self.coder.decode(encoded[:-10])[:192])
+
+  def test_truncated_interleaved(self):
+    message = self.message * 15
+    num_codewords = -(-len(message) // 16)
+    for depth in (8, num_codewords):
+      coder = ECCoder(32, 16, interleave_depth=depth)
+      encoded = coder.encode(message)
+      for cut in (1, 10, 31):
+        self.assertEqual(message, coder.decode(encoded[:-cut]))
+      confidence = numpy.ones(len(encoded) - 31)
+      self.assertEqual(message, coder.decode(encoded[:-31], confidence))
+
+  def test_worker_pool_matches_single_process(self):
+    message = self.message * 20
+    coder = ECCoder(32, 16, num_threads=2)
+    encoded = self.coder.encode(message)
+    self.assertEqual(encoded, coder.encode(message))
+
+    damaged = bytearray(encoded)
+    for start in range(0, len(damaged), 32 * 3):
+      for position in self.random.sample(range(start, start + 32), 8):
+        damaged[position] ^= self.random.randint(1, 255)
+    self.assertEqual(message, coder.decode(str(damaged)))
+    self.assertEqual(message[:-16],
+                     coder.decode(encoded[:-10])[:len(message) - 16])
+
+  def test_codes_share_a_pool(self):
+    message = self.message * 20
+    for n, k in ((32, 16), (32, 20), (40, 16)):
+      coder = ECCoder(n, k, num_threads=2)
+      self.assertEqual(ECCoder(n, k).encode(message), coder.encode(message))
+      self.assertEqual(message, coder.decode(coder.encode(message)))
+    self.assertEqual([2], _pools.keys())
+
+  def test_confidence(self):
+    # 10 damaged bytes per codeword are beyond the 8 errors that 32,16 can
+    # correct, but not when 4 of them are known to be doubtful.
+    message = self.message * 20
+    encoded = self.coder.encode(message)
+    damaged = bytearray(encoded)
+    confidence = numpy.ones(len(damaged))
+    for start in range(0, len(damaged), 32):
+      positions = self.random.sample(range(start, start + 32), 10)
+      for position in positions:
+        damaged[position] ^= self.random.randint(1, 255)
+      confidence[positions[:4]] = 0.1
+    damaged = str(damaged)
+    self.assertNotEqual(message, self.coder.decode(damaged))
+    self.assertEqual(message, self.coder.decode(damaged, confidence))
+    coder = ECCoder(32, 16, num_threads=2)
+    self.assertEqual(message, coder.decode(damaged, confidence))
+    truncated = coder.decode(damaged[:-10], confidence[:-10])
+    self.assertEqual(message[:-16], truncated[:len(message) - 16])
+    self.assertRaises(ValueError, self.coder.decode, damaged, confidence[:-1])
+
+
+if __name__ == '__main__':
+  unittest.main()
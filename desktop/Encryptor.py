@@ -1,13 +1,16 @@
 #!/usr/bin/env python
 
 import base64
+import ECCPlanner
 import sys
 import logging
+import math
 import os
 from tempfile import NamedTemporaryFile
 from json import JSONEncoder
 from PIL import Image
-from util import sha256hash
+from PayloadHeader import PayloadHeader
+from util import draft_resize, sha256hash
 import cStringIO
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO,
@@ -17,11 +20,75 @@ logging.basicConfig(stream=sys.stdout, level=logging.INFO,
 class Encrypt(object):
   _ASPECT_RATIO_DIFFERENCE_LIMIT = .1
 
-  def __init__(self, image_buffer, codec, cipher):
+  # upload_encrypt aims this far under its byte budget, since bytes do not
+  # follow scale exactly. It settles for a fit that fills _BUDGET_FILL of
+  # the budget (about 95% of the limit in each dimension) or one within
+  # _SCALE_TOLERANCE of a scale that does not fit.
+  _BYTE_BUDGET_MARGIN = .97
+  _BUDGET_FILL = .9
+  _SCALE_TOLERANCE = .02
+  _MINIMUM_SCALE = .01
+
+  # Payload formats, named by the header (see PayloadHeader). Version 1
+  # encrypts the base64 of the image, so the painted ciphertext is base64 of
+  # base64 (about 1.78 symbol bytes per image byte). Version 2 encrypts the
+  # image's bytes and base64 encodes only the ciphertext (about 1.33). The
+  # browser extension and the mobile apps read only version 1, so version 2
+  # is opt-in until they read it too.
+  PAYLOAD_VERSION = 1
+
+  # Painted characters ahead of the ciphertext: the SHA-256 hex digest, then
+  # the unpadded base64 of sjcl's 16 byte iv and 8 byte salt.
+  _INTEGRITY_LENGTH = 64
+  _IV_LENGTH = 22
+  _SALT_LENGTH = 11
+  # sjcl's CCM tag (ts 64) ends the ciphertext.
+  _TAG_LENGTH = 8
+
+  # With ecc_quality, the JPEG quality the encrypted image will be saved at,
+  # the payload is Reed-Solomon coded with the parameters ECCPlanner picks
+  # for that channel from the statistics cached at ecc_stats_path. Only the
+  # desktop decoder reads such images.
+  def __init__(self, image_buffer, codec, cipher, version=PAYLOAD_VERSION,
+               ecc_quality=None, ecc_stats_path=ECCPlanner.STATS_PATH):
     self.image_buffer = image_buffer
     self.codec = codec
     self.cipher = cipher
     self.temp_memory_file = image_buffer
+    self.version = version
+    self.ecc_quality = ecc_quality
+    self.ecc_stats_path = ecc_stats_path
+    self.ecc_coder = None
+    # What to pass Codec ahead of the encrypted data (see payload).
+    self.header = str(PayloadHeader(version))
+
+  def _plan_ecc(self, encrypted_length):
+    # The ECCoder for encrypted_length characters of encrypted data, or None
+    # without ECC.
+    if self.ecc_quality is None:
+      return None
+    return ECCPlanner.plan(encrypted_length,
+                           self.codec.symbol_shape.get_name(),
+                           self.ecc_quality, path=self.ecc_stats_path)
+
+  def _encrypt_to_fit(self, raw_image_file_data):
+    # Encrypts the image upload_encrypt settled on, then plans ECC for (and
+    # writes the header of) exactly that payload.
+    encrypted_data = self._raw_image_data_to_encrypted_data(
+      raw_image_file_data)
+    self.ecc_coder = self._plan_ecc(len(encrypted_data))
+    self.header = str(PayloadHeader.from_ecc_coder(self.version,
+                                                   self.ecc_coder))
+    return encrypted_data
+
+  def payload(self, encrypted_data):
+    # What to pass Codec: the header, then the encrypted data, ECC coded and
+    # painted as unpadded base64 (Codec has no symbol for '=') if ECC was
+    # planned.
+    if self.ecc_coder is not None:
+      encrypted_data = base64.b64encode(
+        self.ecc_coder.encode(encrypted_data)).rstrip('=')
+    return self.header + encrypted_data
 
   def _image_path_to_encrypted_data(self, image_path):
     logging.info('Reading raw image data.')
@@ -31,14 +98,19 @@ class Encrypt(object):
 
   def _raw_image_data_to_encrypted_data(self, raw_image_file_data):
     logging.info('Raw data: %s.' % raw_image_file_data[:10])
-    base64_image_file_data = base64.b64encode(raw_image_file_data)
-
-    logging.info('Cipher encoding data. Len: %d.' % len(base64_image_file_data))
-    encrypted_data = self.cipher.encode(base64_image_file_data)
+    if self.version == 1:
+      base64_image_file_data = base64.b64encode(raw_image_file_data)
+      logging.info('Cipher encoding data. Len: %d.' % \
+                     len(base64_image_file_data))
+      encrypted_data = self.cipher.encode(base64_image_file_data)
+    else:
+      logging.info('Cipher encoding data. Len: %d.' % len(raw_image_file_data))
+      encrypted_data = self.cipher.encode_bytes(raw_image_file_data)
 
     # Compute integrity check on the encrypted data, which should be base64
-    # (in the case of V8Cipher, this includes the jsonified data).
-    if self.cipher.__class__.__name__ == 'V8Cipher':
+    # (in the case of the sjcl ciphers, V8Cipher and SJCLCipher, this includes
+    # the jsonified data).
+    if isinstance(encrypted_data, dict):
       _to_hash = \
           encrypted_data['iv'] + \
           encrypted_data['salt'] + \
@@ -51,9 +123,9 @@ class Encrypt(object):
 
     logging.info('Cipher finished. Combined len: %d.' % len(_to_hash))
 
-    # For V8Cipher, we have to tease apart the JSON in order to set the
+    # For the sjcl ciphers, we have to tease apart the JSON in order to set the
     # encrypted_data string correctly.
-    if self.cipher.__class__.__name__ == 'V8Cipher':
+    if isinstance(encrypted_data, dict):
       encrypted_data = \
           integrity_check_value + \
           encrypted_data['iv'] + \
@@ -63,96 +135,153 @@ class Encrypt(object):
     logging.info('Returning encrypted data.')
     return encrypted_data
 
-  def _reduce_image_quality(self, image_path):
-    logging.info('Requalitying image.')
-    image_path.seek(0)
-    im = Image.open(image_path)
-
-    new_file = cStringIO.StringIO()
-    im.save(new_file, 'jpeg', quality=77)
-    logging.info('Deleting image.')
-    del im
-    return new_file
-
-
-  def _reduce_image_size(self, image_path, scale):
-    logging.info('Resizing image.')
-
-    logging.info('Opening image')
-    image_path.seek(0)
-    im = Image.open(image_path)
-
-    logging.info('Opened. Resizing')
-    width, height = im.size
-    im = im.resize((int(width * scale), int(height * scale)))
+  def _reduce_image_size(self, image, size):
+    # JPEG encodes the image, resampled to size (unless it is that size), at
+    # quality 77.
+    if image.size == size:
+      logging.info('Requalitying image.')
+    else:
+      logging.info('Resizing image to (%d, %d).' % size)
+      image = draft_resize(image, size)
 
     new_file = cStringIO.StringIO()
-    im.save(new_file, 'jpeg', quality=77)
-    del im
-    return new_file
-
-  def _estimate_encryption_inflation(self, data):
-    return len(data) * (1.3334**2)
+    image.save(new_file, 'jpeg', quality=77)
+    return new_file, image.size
+
+  @classmethod
+  def painted_length(cls, plaintext_length, version=PAYLOAD_VERSION,
+                     ecc_coder=None):
+    # The exact number of characters Codec paints, header included, for an
+    # image of plaintext_length bytes. With an ecc_coder (an ECCoder), the
+    # payload after the header is coded in whole blocks of k bytes, n bytes
+    # each, and painted as unpadded base64.
+    if version == 1:
+      plaintext_length = 4 * -(-plaintext_length // 3)
+    ciphertext_length = plaintext_length + cls._TAG_LENGTH
+    payload_length = cls._INTEGRITY_LENGTH + cls._IV_LENGTH + \
+        cls._SALT_LENGTH + -(-8 * ciphertext_length // 6)
+    if ecc_coder is not None:
+      n, k = ecc_coder.codeword_length, ecc_coder.message_byte_length
+      payload_length = -(-8 * (-(-payload_length // k) * n) // 6)
+    return PayloadHeader.LENGTH + payload_length
+
+  def _fits(self, data_length, size, dimension_limit):
+    # Whether an image of size, data_length bytes long, encrypts to within
+    # dimension_limit. The encrypted image keeps the aspect ratio Codec was
+    # made with, to within its symbol grid, whatever the scale: one further
+    # off than _ASPECT_RATIO_DIFFERENCE_LIMIT (a short panorama, say) is
+    # only reported, as shrinking the image would not bring it closer.
+    _w, _h = size
+    painted_length = self.painted_length(data_length, self.version,
+                                         self.ecc_coder)
+    width, height = \
+        self.codec.get_prospective_image_dimensions_from_data_len(
+          painted_length)
+    logging.info('Image dimensions for len %d: (w: %d, h: %d).' % \
+                   (painted_length, width, height))
+    if (width > dimension_limit) or (height > dimension_limit):
+      return False
+    ar_difference = abs((_w / float(_h)) - (width / float(height)))
+    if ar_difference >= self._ASPECT_RATIO_DIFFERENCE_LIMIT:
+      logging.warning('Dimension limits okay. But AR off %.2f.' %
+                      ar_difference)
+    return True
+
+  def _byte_budget(self, dimension_limit):
+    # The most image bytes whose encryption fits within dimension_limit.
+    # Codec's dimensions grow with the data, so bisect on the length.
+    def within(length):
+      width, height = \
+          self.codec.get_prospective_image_dimensions_from_data_len(
+            self.painted_length(length, self.version, self.ecc_coder))
+      return width <= dimension_limit and height <= dimension_limit
+
+    low, high = 0, dimension_limit ** 2
+    while low < high:
+      middle = (low + high + 1) // 2
+      if within(middle):
+        low = middle
+      else:
+        high = middle - 1
+    return low
 
   def upload_encrypt(self, dimension_limit = 2048):
-    requality_limit = 1
-    requality_count = 0
-    rescale_count = 0
-
-    prospective_image_dimensions_from_data_len = \
-        self.codec.get_prospective_image_dimensions_from_data_len
-
-    _image_buffer = self.temp_memory_file
-
+    # Encrypts the image as it is if it fits. If not, searches for a scale
+    # that fits, each try a JPEG encode at quality 77: first the scale the
+    # original's own bytes predict for the byte budget, then the scale
+    # predicted by a power law, bytes ~ scale ** exponent, through the last
+    # two tries (the exponent is 2, constant bytes per pixel, after one),
+    # capped at full size. A prediction outside the scales known to fit and
+    # not to fit falls back to bisection. The search stops at a fit that
+    # fills _BUDGET_FILL of the budget, at full size, or within
+    # _SCALE_TOLERANCE of a scale that does not fit.
+    #
+    # A JPEG is decoded at the smallest DCT scale that covers the try (see
+    # draft_resize), and decoded again only for a try larger than that.
+    #
+    # Returns the encrypted data; Codec paints payload() of it.
+    data = self.temp_memory_file.getvalue()
+    self.temp_memory_file.seek(0)
+    image = Image.open(self.temp_memory_file)
+    logging.info('Cleartext image dimensions: (%d, %d).' % image.size)
+    # Sizes allow for the ECC planned for the original, the longest payload
+    # tried; a shorter one needs no more parity.
+    self.ecc_coder = self._plan_ecc(
+      self.painted_length(len(data), self.version) - PayloadHeader.LENGTH)
+    if self._fits(len(data), image.size, dimension_limit):
+      return self._encrypt_to_fit(data)
+
+    width, height = image.size
+    budget = self._byte_budget(dimension_limit)
+    raster = None
+    fitting_scale, fitting_buffer = 0., None
+    failing_scale = None
+    tries = []
+    scale = min(1., math.sqrt(self._BYTE_BUDGET_MARGIN * budget / len(data)))
     while True:
-      logging.info('Start of while loop.')
-
-      _image_buffer.seek(0)
-      _image = Image.open(_image_buffer)
-      _w, _h = _image.size
-      logging.info('Cleartext image dimensions: (%d, %d).' % (_w, _h))
-      del _image
-
-      estimated_encrypted_data_len = self._estimate_encryption_inflation(
-        _image_buffer.getvalue())
-      width, height = prospective_image_dimensions_from_data_len(
-        estimated_encrypted_data_len)
-      logging.info('Estimated image dimensions for len %d: (w: %d, h: %d).' % \
-                     (estimated_encrypted_data_len, width, height))
-
-      # Rejection criteria for this round. Dimensions greater than limits or
-      # our aspect ratio is too far off.
-      if (width <= dimension_limit) and (height <= dimension_limit):
-        ar_difference = abs((_w / float(_h)) - (width / float(height)))
-        if (ar_difference < self._ASPECT_RATIO_DIFFERENCE_LIMIT):
-          encrypted_data = self._raw_image_data_to_encrypted_data(
-            _image_buffer.getvalue())
+      size = (max(int(round(width * scale)), 1),
+              max(int(round(height * scale)), 1))
+      if raster is None or raster.size[0] < size[0] or \
+          raster.size[1] < size[1]:
+        raster = Image.open(cStringIO.StringIO(data))
+        raster.draft(raster.mode, size)
+        raster.load()
+        logging.info('Decoded image at (%d, %d).' % raster.size)
+      buffer, size = self._reduce_image_size(raster, size)
+      length = len(buffer.getvalue())
+      tries.append((scale, length))
+      if self._fits(length, size, dimension_limit):
+        fitting_scale, fitting_buffer = scale, buffer
+        if length >= self._BUDGET_FILL * budget:
           break
-        else:
-          logging.warning('Dimension limits okay. But AR off %.2f.' %
-                          ar_difference)
-
-      logging.info('Dimensions/AR off (w: %d, h: %d).' % (width, height))
-
-      # Strategies to reduce raw bytes that we need to encrypt: requality,
-      # rescale.
-      if requality_count < requality_limit:
-        logging.info('Requality image.')
-        _image = self._reduce_image_quality(_image_buffer)
-        del _image_buffer
-        _image_buffer = _image
-        requality_count += 1
-
       else:
-        rescale_count += 1
-        logging.info('Rescale with original image.')
-        _image = self._reduce_image_size(
-          self.image_buffer, 1.0 - (0.05 * rescale_count))
-        del _image_buffer
-        _image_buffer = _image
-
-    del _image_buffer
-    return encrypted_data
+        failing_scale = scale
+      if failing_scale is None:
+        upper_scale = 1.
+      else:
+        upper_scale = failing_scale
+      if fitting_buffer is not None and \
+          upper_scale - fitting_scale <= self._SCALE_TOLERANCE * upper_scale:
+        break
+      if failing_scale is not None and failing_scale < self._MINIMUM_SCALE:
+        raise ValueError('Could not fit the image within %d pixels.' %
+                         dimension_limit)
+
+      exponent = 2.
+      if len(tries) > 1:
+        (last_scale, last_length), (scale, length) = tries[-2:]
+        if last_scale != scale and last_length != length:
+          exponent = min(max(math.log(float(length) / last_length) /
+                             math.log(scale / last_scale), 1.), 3.)
+      scale = min(scale * (self._BYTE_BUDGET_MARGIN * budget / length) **
+                  (1 / exponent), 1.)
+      if not fitting_scale < scale <= upper_scale or scale == failing_scale:
+        scale = (fitting_scale + upper_scale) / 2.
+      logging.info('Dimensions off; trying scale %.3f.' % scale)
+
+    logging.info('Fit at scale %.3f after %d encodes.' % (fitting_scale,
+                                                          len(tries)))
+    return self._encrypt_to_fit(fitting_buffer.getvalue())
 
   def encrypt(self):
     image = Image.open(self.image_path)
@@ -165,7 +294,7 @@ class Encrypt(object):
 def main(argv):
   from Codec import Codec
   from ImageCoder import Base64MessageSymbolCoder, Base64SymbolSignalCoder
-  from Cipher.PyV8Cipher import V8Cipher as Cipher
+  from Cipher.SJCLCipher import SJCLCipher as Cipher
   from PIL import Image
   from SymbolShape import two_square
 
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+from Cipher.SJCLCipher import SJCLCipher
+from Codec import Codec
+from ECCoder import ECCoder
+from Encryptor import Encrypt
+from ImageCoder import Base64MessageSymbolCoder, Base64SymbolSignalCoder
+from PIL import Image
+from PayloadHeader import PayloadHeader
+from SymbolShape import two_square
+import ECCPlanner
+import base64
+import cStringIO
+import itertools
+import numpy
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+class EncryptTest(unittest.TestCase):
+  def test_painted_length(self):
+    generator = random.Random(0)
+    cipher = SJCLCipher('password')
+    # Readers other than this tool know only version 1.
+    self.assertEqual('aesthete', Encrypt(None, None, cipher).header)
+    for version in (1, 2):
+      encrypt = Encrypt(None, None, cipher, version)
+      for length in range(0, 10) + [4096, 65536, 100001]:
+        data = ''.join(chr(generator.randint(0, 255)) for _ in xrange(length))
+        painted = encrypt.header + \
+            encrypt._raw_image_data_to_encrypted_data(data)
+        self.assertEqual(len(painted), Encrypt.painted_length(length, version))
+
+        coder = ECCoder(32, 16)
+        coded = encrypt.header + \
+            base64.b64encode(coder.encode(painted[8:])).rstrip('=')
+        self.assertEqual(len(coded),
+                         Encrypt.painted_length(length, version, coder))
+
+  def test_upload_encrypt_fits(self):
+    # A photo-like image: smooth, with some noise. (Pure noise JPEGs shrink
+    # by a step where draft_resize starts antialiasing, at half size, so a
+    # fit there can leave much of the budget unused.)
+    state = numpy.random.RandomState(0)
+    image = Image.fromarray(
+      (state.rand(30, 40, 3) * 255).astype(numpy.uint8)).resize(
+        (400, 300), Image.BICUBIC)
+    image = Image.fromarray(numpy.clip(
+      numpy.asarray(image) + state.normal(0, 12, (300, 400, 3)), 0,
+      255).astype(numpy.uint8))
+    image_buffer = cStringIO.StringIO()
+    image.save(image_buffer, 'JPEG', quality=95)
+    for version, limit in itertools.product((1, 2), (2048, 512, 256)):
+      codec = Codec(two_square, 4 / 3., Base64MessageSymbolCoder(),
+                    Base64SymbolSignalCoder())
+      encrypt = Encrypt(cStringIO.StringIO(image_buffer.getvalue()), codec,
+                        SJCLCipher('password'), version)
+      data = encrypt.upload_encrypt(limit)
+      width, height = codec.get_prospective_image_dimensions_from_data_len(
+        len(encrypt.header + data))
+      self.assertTrue(width <= limit and height <= limit)
+      # Not much smaller than it could be.
+      self.assertTrue(width > .9 * limit or limit == 2048)
+
+  def test_upload_encrypt_panorama(self):
+    # Codec's grid keeps a short encrypted image off a 10:1 aspect ratio at
+    # any scale, which must not drive the search down to nothing.
+    state = numpy.random.RandomState(0)
+    image = Image.fromarray(
+      (state.rand(500, 5000, 3) * 255).astype(numpy.uint8))
+    image_buffer = cStringIO.StringIO()
+    image.save(image_buffer, 'JPEG', quality=95)
+    for version in (1, 2):
+      codec = Codec(two_square, 10., Base64MessageSymbolCoder(),
+                    Base64SymbolSignalCoder())
+      encrypt = Encrypt(cStringIO.StringIO(image_buffer.getvalue()), codec,
+                        SJCLCipher('password'), version)
+      data = encrypt.upload_encrypt(2048)
+      width, height = codec.get_prospective_image_dimensions_from_data_len(
+        len(encrypt.payload(data)))
+      self.assertTrue(.9 * 2048 < width <= 2048 and height <= 2048)
+
+  def test_upload_encrypt_ecc(self):
+    directory = tempfile.mkdtemp()
+    stats_path = os.path.join(directory, 'stats.json')
+    try:
+      ECCPlanner.save_stats({ECCPlanner._key('two_square', 80, 'RGB'): {
+        'bytes': 10 ** 5, 'byte_errors': 100, 'trials': 3, 'desyncs': 0}},
+                            stats_path)
+      state = numpy.random.RandomState(0)
+      image = Image.fromarray(
+        (state.rand(300, 400, 3) * 255).astype(numpy.uint8))
+      image_buffer = cStringIO.StringIO()
+      image.save(image_buffer, 'JPEG', quality=95)
+      codec = Codec(two_square, 4 / 3., Base64MessageSymbolCoder(),
+                    Base64SymbolSignalCoder())
+      cipher = SJCLCipher('password')
+      encrypt = Encrypt(image_buffer, codec, cipher, ecc_quality=80,
+                        ecc_stats_path=stats_path)
+      data = encrypt.upload_encrypt(512)
+    finally:
+      shutil.rmtree(directory)
+
+    payload = encrypt.payload(data)
+    width, height = codec.get_prospective_image_dimensions_from_data_len(
+      len(payload))
+    self.assertTrue(width <= 512 and height <= 512)
+    header = PayloadHeader.parse(payload[:8])
+    self.assertTrue(0 < header.k < header.n)
+    self.assertEqual(-(-len(data) // header.k), header.depth)
+
+    codec.encode(payload)
+    codec.decode(codec.get_result())
+    self.assertEqual(len(payload), 8 + len(codec.get_result()))
+    coded = codec.get_result()
+    coded += '=' * (-len(coded) % 4)
+    decoded = PayloadHeader.parse(codec.header).ecc_coder().decode(
+      base64.b64decode(coded))
+    self.assertEqual(data, decoded)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 from util import bsearch, average
+import numpy
 
 class SymbolSignalCoder(object):
   thresholds = {}
@@ -7,6 +8,12 @@ class SymbolSignalCoder(object):
     pass
   def signal_to_symbol(self, values):
     pass
+  def encode_many(self, symbols):
+    pass
+  def decode_many(self, signals):
+    pass
+  def confidence_many(self, signals):
+    pass
 
 class MessageSymbolCoder(object):
   encoding = None
@@ -14,6 +21,12 @@ class MessageSymbolCoder(object):
     pass
   def symbol_to_message(self, values):
     pass
+  def encode_many(self, message):
+    pass
+  def decode_many(self, symbols):
+    pass
+  def confidence_many(self, symbols, confidences):
+    pass
 
 class Base64SymbolSignalCoder(SymbolSignalCoder):
   thresholds = { # Well, nine (we add one for "black").
@@ -29,6 +42,21 @@ class Base64SymbolSignalCoder(SymbolSignalCoder):
     }
 
   _inv_thresholds = dict((v,k) for k, v in thresholds.iteritems())
+  _keys = sorted(_inv_thresholds.keys())
+
+  # Symbol value -> signal.
+  _signals = numpy.array([thresholds[str(i)] for i in range(len(thresholds))],
+                         dtype=numpy.uint8)
+
+  # Luminance -> symbol value. Thresholds are 28 apart, so every point halfway
+  # between two of them is an integer and the symbol for any average in
+  # [lum, lum + 1) is the symbol for lum itself.
+  _symbols = numpy.array([int(_inv_thresholds[_keys[bsearch(_keys, lum)]])
+                          for lum in range(256)], dtype=numpy.uint8)
+
+  # Half the distance between neighboring thresholds: how far a signal can
+  # stray from its threshold before it reads as another symbol.
+  _margin = (_keys[1] - _keys[0]) / 2.
 
   def symbol_to_signal(self, symbol_val):
     return self.thresholds[symbol_val]
@@ -39,23 +67,63 @@ class Base64SymbolSignalCoder(SymbolSignalCoder):
       sym_values = values.get(sym_i)
       avg_value = average([average(sym_values.get(coord))
                            for coord in sym_values])
-      keys = sorted(self._inv_thresholds.keys())
-      ret.append(int(self._inv_thresholds[keys[bsearch(keys, avg_value)]]))
+      ret.append(int(self._symbols[min(int(avg_value), 255)]))
     return ret
 
+  def encode_many(self, symbols):
+    return self._signals[symbols]
+
+  def decode_many(self, signals):
+    return self._symbols[numpy.clip(signals, 0, 255).astype(numpy.intp)]
+
+  def confidence_many(self, signals):
+    # How far each signal is from reading as a neighboring symbol, from 0
+    # (exactly between two thresholds) to 1 (on or beyond its threshold).
+    signals = numpy.asarray(signals, dtype=numpy.float64)
+    distance = numpy.abs(signals - self._signals[self.decode_many(signals)])
+    confidence = numpy.clip(1 - distance / self._margin, 0, 1)
+    outside = (signals >= self._keys[-1]) | (signals <= self._keys[0])
+    confidence[outside] = 1
+    return confidence
+
 class Base64MessageSymbolCoder(MessageSymbolCoder):
   encoding = 'base64'
   values = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
   values_dict = dict((val,i) for i,val in enumerate(values))
 
+  # Character -> octal digit pair, as the string message_to_symbol returns.
+  _octal = dict((val, '%o%o' % divmod(i, 8)) for i,val in enumerate(values))
+
+  # Byte -> (high, low) octal digits; -1 for bytes outside the alphabet.
+  _symbols = -numpy.ones((256, 2), dtype=numpy.int16)
+  _symbols[numpy.frombuffer(values, dtype=numpy.uint8)] = \
+      [divmod(i, 8) for i in range(len(values))]
+
+  # Symbol pair (high * 8 + low) -> byte.
+  _values = numpy.frombuffer(values, dtype=numpy.uint8)
+
   def message_to_symbol(self, char):
-    index = self.values_dict[char]
-    octal_val = '%02s' % oct(index)[1:]
-    return octal_val.replace(' ','0')
+    return self._octal[char]
 
   def symbol_to_message(self, values):
     assert len(values) == 2
     if values[0] == 8 or values[1] == 8:
       return ''
-    index = int('%d%d' % (values[0], values[1]), 8)
-    return self.values[index]
+    return self.values[values[0] * 8 + values[1]]
+
+  def encode_many(self, message):
+    symbols = self._symbols[numpy.frombuffer(message, dtype=numpy.uint8)]
+    invalid = numpy.flatnonzero(symbols[:, 0] < 0)
+    if len(invalid):
+      raise KeyError(message[invalid[0]])
+    return symbols
+
+  def decode_many(self, symbols):
+    # Symbol pairs containing an 8 ("black") carry no message.
+    symbols = symbols[(symbols < 8).all(axis=-1)].astype(numpy.intp)
+    return self._values[symbols[:, 0] * 8 + symbols[:, 1]].tostring()
+
+  def confidence_many(self, symbols, confidences):
+    # Confidence of each character decode_many returns: that of the less
+    # certain of its two symbols.
+    return confidences[(symbols < 8).all(axis=-1)].min(axis=-1)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# Interleaving between ECCoder and Codec. JPEG damage is local (8x8 blocks,
+# runs along image rows), so with codewords laid out back to back one bad
+# region can exceed a codeword's correction power while the rest are
+# pristine. Interleaving to depth d sends byte j of d consecutive codewords
+# out together, so each codeword's bytes end up d bytes apart in the image.
+
+import numpy
+
+class Interleaver(object):
+  # The deepest interleaving a payload's header can name (see PayloadHeader).
+  MAX_DEPTH = 64 ** 2 - 1
+
+  def __init__(self, codeword_length, depth):
+    if not 1 <= depth <= self.MAX_DEPTH:
+      raise ValueError('depth must be between 1 and %d' % self.MAX_DEPTH)
+    self.codeword_length = codeword_length
+    self.depth = depth
+
+  def _permutation(self, length):
+    # Index into the coded data of each interleaved byte. Whole codewords are
+    # taken depth at a time; a last, shallower group is interleaved to its
+    # own depth and any partial codeword is left where it is.
+    n = self.codeword_length
+    num_codewords = length // n
+    num_groups, shallow = divmod(num_codewords, self.depth)
+
+    deep_end = num_groups * self.depth * n
+    deep = numpy.arange(deep_end).reshape(
+      num_groups, self.depth, n).transpose(0, 2, 1).ravel()
+    shallow_end = deep_end + shallow * n
+    shallow = numpy.arange(deep_end, shallow_end).reshape(
+      shallow, n).transpose().ravel()
+    return numpy.concatenate(
+      (deep, shallow, numpy.arange(shallow_end, length)))
+
+  def interleave(self, data):
+    # data is a string or an array with one item per byte; the result is of
+    # the same kind.
+    if self.depth == 1:
+      return data
+    if isinstance(data, str):
+      return self.interleave(numpy.frombuffer(data, dtype=numpy.uint8)) \
+          .tostring()
+    return numpy.asarray(data)[self._permutation(len(data))]
+
+  def deinterleave(self, data):
+    if self.depth == 1:
+      return data
+    if isinstance(data, str):
+      return self.deinterleave(numpy.frombuffer(data, dtype=numpy.uint8)) \
+          .tostring()
+    data = numpy.asarray(data)
+    deinterleaved = numpy.empty_like(data)
+    deinterleaved[self._permutation(len(data))] = data
+    return deinterleaved
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+from Interleaver import Interleaver
+import numpy
+import unittest
+
+class InterleaverTest(unittest.TestCase):
+  def setUp(self):
+    # Seven 4 byte codewords and a partial one.
+    self.data = 'abcdefghijklmnopqrstuvwxyz0123'
+    self.interleaver = Interleaver(4, 3)
+
+  def test_interleave(self):
+    # Two groups of three codewords, a shallow group of one and the partial
+    # codeword, which stays put.
+    self.assertEqual('aeibfjcgkdhl' 'mqunrvoswptx' 'yz01' '23',
+                     self.interleaver.interleave(self.data))
+
+  def test_round_trip(self):
+    for length in (0, 3, 4, 12, 29, 30, 255 * 7 + 5):
+      data = ''.join(chr(i % 256) for i in range(length))
+      for depth in (1, 2, 3, 64):
+        interleaver = Interleaver(4, depth)
+        self.assertEqual(
+          data, interleaver.deinterleave(interleaver.interleave(data)))
+
+  def test_arrays(self):
+    confidence = numpy.arange(len(self.data)) / 100.
+    interleaved = self.interleaver.interleave(confidence)
+    self.assertEqual(
+      self.interleaver.interleave(self.data),
+      ''.join(self.data[int(round(value * 100))] for value in interleaved))
+    self.assertTrue(
+      (confidence == self.interleaver.deinterleave(interleaved)).all())
+
+  def test_invalid_depth(self):
+    self.assertRaises(ValueError, Interleaver, 255, 0)
+    self.assertRaises(ValueError, Interleaver, 255, Interleaver.MAX_DEPTH + 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
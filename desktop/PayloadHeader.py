@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# The eight characters Codec paints ahead of the payload, which say how to
+# read it. 'aesthete' is a version 1 payload without ECC, the only kind the
+# browser extension and the mobile apps knew to begin with, so it keeps that
+# header. Every other payload has one of this layout:
+#
+#   'C', then six base64 digits of a 36 bit field, then a check digit,
+#
+# where the field holds, from the top, the payload version (4 bits), the
+# Reed-Solomon codeword and message lengths n and k (8 bits each; both 0
+# without ECC) and the interleave depth (12 bits), then 4 zero bits. The
+# check digit is the sum of the others, 'C' included, modulo 64.
+
+from ECCoder import ECCoder
+from ImageCoder import Base64MessageSymbolCoder
+from Interleaver import Interleaver
+
+class PayloadHeader(object):
+  LENGTH = 8
+  LEGACY = 'aesthete'
+  PREFIX = 'C'
+
+  # Payload versions (see Encryptor).
+  VERSIONS = (1, 2)
+
+  def __init__(self, version=1, n=0, k=0, depth=1):
+    if version not in self.VERSIONS:
+      raise ValueError('unknown payload version %r' % version)
+    if (n, k) == (0, 0):
+      if depth != 1:
+        raise ValueError('a payload without ECC is not interleaved')
+    elif not 0 < k < n <= 255 or not 1 <= depth <= Interleaver.MAX_DEPTH:
+      raise ValueError('invalid ECC parameters %d,%d at depth %d' %
+                       (n, k, depth))
+    self.version = version
+    self.n = n
+    self.k = k
+    self.depth = depth
+
+  @classmethod
+  def from_ecc_coder(cls, version, ecc_coder=None):
+    if ecc_coder is None:
+      return cls(version)
+    return cls(version, ecc_coder.codeword_length,
+               ecc_coder.message_byte_length, ecc_coder.interleaver.depth)
+
+  def ecc_coder(self, num_threads=1):
+    # The ECCoder the payload was coded with, or None without ECC.
+    if not self.n:
+      return None
+    return ECCoder(self.n, self.k, num_threads, self.depth)
+
+  def __str__(self):
+    if (self.version, self.n) == (1, 0):
+      return self.LEGACY
+    values = Base64MessageSymbolCoder.values
+    field = (self.version << 32 | self.n << 24 | self.k << 16 |
+             self.depth << 4)
+    digits = [(field >> shift) & 63 for shift in range(30, -1, -6)]
+    digits.append((values.index(self.PREFIX) + sum(digits)) % 64)
+    return self.PREFIX + ''.join(values[digit] for digit in digits)
+
+  def __repr__(self):
+    return 'PayloadHeader(%d, %d, %d, %d)' % (self.version, self.n, self.k,
+                                              self.depth)
+
+  @classmethod
+  def _digits(cls, header):
+    # The base64 digits after the prefix of a header of our layout, or None.
+    values = Base64MessageSymbolCoder.values
+    if header is None or len(header) != cls.LENGTH or \
+          not header.startswith(cls.PREFIX) or \
+          any(c not in values for c in header):
+      return None
+    return [values.index(c) for c in header[1:]]
+
+  @classmethod
+  def _checks(cls, digits):
+    values = Base64MessageSymbolCoder.values
+    return (values.index(cls.PREFIX) + sum(digits[:-1])) % 64 == digits[-1]
+
+  @classmethod
+  def damaged(cls, header):
+    # Whether header has our layout but fails its check digit. Any other
+    # header parse rejects may be an 'aesthete' one damaged by JPEG, which
+    # decoders from before this header never read.
+    digits = cls._digits(header)
+    return digits is not None and not cls._checks(digits)
+
+  @classmethod
+  def parse(cls, header):
+    # The PayloadHeader a decoded Codec header stands for, or None if it is
+    # no header of ours (or is damaged).
+    if header == cls.LEGACY:
+      return cls()
+    digits = cls._digits(header)
+    if digits is None or not cls._checks(digits):
+      return None
+    field = 0
+    for digit in digits[:-1]:
+      field = field << 6 | digit
+    if field & 15:
+      return None
+    try:
+      return cls(field >> 32, field >> 24 & 255, field >> 16 & 255,
+                 field >> 4 & 4095)
+    except ValueError:
+      return None
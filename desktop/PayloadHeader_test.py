@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+from Codec import Codec
+from ECCoder import ECCoder
+from ImageCoder import Base64MessageSymbolCoder, Base64SymbolSignalCoder
+from Interleaver import Interleaver
+from PayloadHeader import PayloadHeader
+from SymbolShape import two_square
+import base64
+import unittest
+
+class PayloadHeaderTest(unittest.TestCase):
+  def fields(self, header):
+    return (header.version, header.n, header.k, header.depth)
+
+  def test_legacy(self):
+    self.assertEqual('aesthete', str(PayloadHeader()))
+    self.assertEqual((1, 0, 0, 1),
+                     self.fields(PayloadHeader.parse('aesthete')))
+    self.assertEqual(None, PayloadHeader.parse('aesthete').ecc_coder())
+
+  def test_round_trip(self):
+    for fields in ((2, 0, 0, 1), (1, 255, 223, 1), (2, 255, 251, 700),
+                   (2, 2, 1, Interleaver.MAX_DEPTH), (1, 128, 64, 64)):
+      header = str(PayloadHeader(*fields))
+      self.assertEqual(8, len(header))
+      self.assertTrue(header.startswith('C'))
+      self.assertEqual(fields, self.fields(PayloadHeader.parse(header)))
+
+  def test_ecc_coder(self):
+    coder = ECCoder(255, 223, interleave_depth=700)
+    header = PayloadHeader.parse(str(PayloadHeader.from_ecc_coder(2, coder)))
+    decoded = header.ecc_coder()
+    self.assertEqual((255, 223, 700),
+                     (decoded.codeword_length, decoded.message_byte_length,
+                      decoded.interleaver.depth))
+
+  def test_damaged(self):
+    header = str(PayloadHeader(2, 255, 223, 700))
+    damaged = header[:3] + ('A' if header[3] != 'A' else 'B') + header[4:]
+    for header in (None, '', 'aesthet2', 'aesthetX', 'CAAAAAAA', 'C', damaged,
+                   'C=======', 'bacchant'):
+      self.assertEqual(None, PayloadHeader.parse(header))
+      # Only ours failing the check digit count as damaged.
+      self.assertEqual(header in (damaged, 'CAAAAAAA'),
+                       PayloadHeader.damaged(header))
+    self.assertFalse(PayloadHeader.damaged(str(PayloadHeader(2))))
+
+  def test_invalid(self):
+    for fields in ((3, 0, 0, 1), (2, 0, 0, 2), (2, 10, 10, 1), (2, 10, 0, 1),
+                   (2, 255, 223, 0), (2, 255, 223, Interleaver.MAX_DEPTH + 1)):
+      self.assertRaises(ValueError, PayloadHeader, *fields)
+
+  def test_survives_codec(self):
+    header = str(PayloadHeader(2, 4, 2, 700))
+    payload = base64.b64encode('abcdefghijklmnopqrstuvwxyz0123' * 100)
+    codec = Codec(two_square, 1.0, Base64MessageSymbolCoder(),
+                  Base64SymbolSignalCoder())
+    codec.encode(header + payload)
+    codec.decode(codec.get_result())
+    self.assertEqual((2, 4, 2, 700),
+                     self.fields(PayloadHeader.parse(codec.header)))
+
+
+if __name__ == '__main__':
+  unittest.main()
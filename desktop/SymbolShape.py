@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import numpy
 
 class SymbolShape(object):
   # Used for converting shape geometry description into a coordinate map.
@@ -6,15 +7,34 @@ class SymbolShape(object):
   # coordinate's shape membership by a value greater than zero (zero is reserved
   # for 'empty' coordinates).
   # TODO(tierney): What to do about empty coordinates.
+  #
+  # Shapes are analyzed once, when constructed, and are immutable afterwards so
+  # a single instance can be shared between threads and processes.
 
-  _analyzed = False
-  _index_map = {}
-  _width = -1
-  _height = -1
+  __slots__ = ('shape', 'name', '_width', '_height', '_coords', '_index_map',
+               '_labels', '_offsets', '_bounding_box')
 
-  def __init__(self, shape, name):
-    self.shape = shape
-    self.name = name
+  def __init__(self, shape, name=None):
+    _set = super(SymbolShape, self).__setattr__
+    _set('shape', tuple(tuple(row) for row in shape))
+    _set('name', name)
+    for attr, value in zip(('_width', '_height', '_coords', '_index_map',
+                            '_labels', '_offsets', '_bounding_box'),
+                           self._analyze()):
+      _set(attr, value)
+
+  def __setattr__(self, attr, value):
+    raise AttributeError('SymbolShape is immutable.')
+
+  def __delattr__(self, attr):
+    raise AttributeError('SymbolShape is immutable.')
+
+  def __reduce__(self):
+    # Rebuilding from the geometry is cheaper to pickle than the analysis.
+    return (SymbolShape, (self.shape, self.name))
+
+  def __repr__(self):
+    return 'SymbolShape(%r, %r)' % (self.shape, self.name)
 
   def get_name(self):
     return self.name
@@ -22,54 +42,87 @@ class SymbolShape(object):
   def get_num_symbol_shapes(self):
     # Count the number of distinct symbol_shapes, ignoring zero-valued
     # symbol_shapes.
-    self.analyze()
-    shapes = self._index_map.keys()
-    # Remove zero if we have symbol_shapes that were entered as such.
-    if 0 in shapes:
-      shapes.remove(0)
-    return len(shapes)
+    return len([index for index in self._index_map if index != 0])
 
   def get_all_symbol_shapes(self):
-    self.analyze()
-    return self._index_map
+    return dict(self._index_map)
 
   def get_symbol_shape_coords(self, index):
-    self.analyze()
     return self._index_map.get(index)
 
+  def get_symbol_coords(self, index):
+    # The coordinates of a symbol as an ordered tuple of (x, y).
+    return self._coords.get(index)
+
   def get_shape_width(self):
-    self.analyze()
     return self._width
 
   def get_shape_height(self):
-    self.analyze()
     return self._height
 
   def get_shape_size(self):
-    self.analyze()
     return self._width, self._height
 
+  def get_bounding_box(self):
+    # (left, top, right, bottom) of the non-empty coordinates, exclusive of
+    # right and bottom.
+    return self._bounding_box
+
+  def get_labels(self):
+    # Shape geometry as a read-only array: labels[y, x] is the symbol index
+    # owning the coordinate (zero for empty coordinates).
+    return self._labels
+
+  def get_symbol_offsets(self, index):
+    # The (ys, xs) index arrays of a symbol's coordinates.
+    return self._offsets.get(index)
+
   def analyze(self):
-    if not self._analyzed:
-      self._analyze()
-      self._analyzed = True
-    return self._analyzed
+    # Shapes are analyzed on construction.
+    return True
 
   def _analyze(self):
-    self._height = len(self.shape)
-    for y, row in enumerate(self.shape):
-
-      # Check width measurement is always the same, or assign one if not already
-      # done so.
-      if self._width >= 0:
-        assert self._width == len(row)
-      else:
-        self._width = len(row)
+    height = len(self.shape)
+    width = len(self.shape[0]) if height else 0
+    for row in self.shape:
+      assert width == len(row)
 
+    coord_sets = {}
+    for y, row in enumerate(self.shape):
       for x, index in enumerate(row):
-        if index not in self._index_map:
-          self._index_map[index] = set()
-        self._index_map[index].add((x,y))
+        coord_sets.setdefault(index, set()).add((x, y))
+
+    coords = {}
+    offsets = {}
+    for index, coord_set in coord_sets.iteritems():
+      # Order the coordinates as iterating a dict keyed by them would, which is
+      # how the decoder has always accumulated a symbol's pixels.
+      ordered = {}
+      for coord in coord_set:
+        ordered[coord] = None
+      coords[index] = tuple(ordered)
+      if index == 0:
+        continue
+      xs, ys = zip(*coords[index])
+      offsets[index] = (self._frozen_array(ys), self._frozen_array(xs))
+
+    index_map = dict((index, frozenset(coord_set))
+                     for index, coord_set in coord_sets.iteritems())
+
+    labels = self._frozen_array(self.shape)
+    filled_ys, filled_xs = numpy.nonzero(labels)
+    if len(filled_xs):
+      bounding_box = (int(filled_xs.min()), int(filled_ys.min()),
+                      int(filled_xs.max()) + 1, int(filled_ys.max()) + 1)
+    else:
+      bounding_box = (0, 0, 0, 0)
+
+    return width, height, coords, index_map, labels, offsets, bounding_box
+
+  def _frozen_array(self, values):
+    array = numpy.array(values, dtype=numpy.intp)
+    array.setflags(write=False)
+    return array
 
 
 four_square = SymbolShape([[1, 1, 1, 1, 2, 2, 2, 2],
@@ -101,3 +154,9 @@ two_by_one = SymbolShape([[1, 2],
 
 one_square = SymbolShape([[1, 2]],
                          'one_square')
+
+# Every shape above, by name.
+AVAILABLE_SHAPES = dict(
+  (symbol_shape.get_name(), symbol_shape)
+  for symbol_shape in (four_square, three_square, two_by_four, two_by_three,
+                       two_square, two_by_one, one_square))
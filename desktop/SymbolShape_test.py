@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
-from SymbolShape import SymbolShape
+from SymbolShape import SymbolShape, two_square, four_square
+import cPickle
 import unittest
 
 class TestSymbolShape(unittest.TestCase):
@@ -33,6 +34,38 @@ class TestSymbolShape(unittest.TestCase):
     _ = self.symbol_shape.get_shape_height()
     self.assertEqual(2, _)
 
+  def test_get_labels(self):
+    _ = self.symbol_shape.get_labels()
+    self.assertEqual(self.shape, _.tolist())
+    self.assertRaises(ValueError, _.__setitem__, (0, 0), 2)
+
+  def test_get_symbol_offsets(self):
+    ys, xs = self.symbol_shape.get_symbol_offsets(2)
+    self.assertEqual(set([(2, 0), (1, 0), (2, 1)]), set(zip(xs, ys)))
+
+  def test_get_bounding_box(self):
+    symbol_shape = SymbolShape([[0, 0, 0],
+                                [0, 1, 2],
+                                [0, 1, 2]])
+    self.assertEqual((1, 1, 3, 3), symbol_shape.get_bounding_box())
+    self.assertEqual(2, symbol_shape.get_num_symbol_shapes())
+
+  def test_immutable(self):
+    self.assertRaises(AttributeError, setattr, self.symbol_shape, 'name', 'x')
+    self.assertRaises(AttributeError, setattr, self.symbol_shape, 'other', 1)
+
+  def test_shapes_are_independent(self):
+    # Analyzing one shape must not leak coordinates into another.
+    self.assertEqual(set([(0, 0), (1, 0), (0, 1), (1, 1)]),
+                     two_square.get_symbol_shape_coords(1))
+    self.assertEqual(16, len(four_square.get_symbol_shape_coords(1)))
+
+  def test_pickle(self):
+    _ = cPickle.loads(cPickle.dumps(four_square, cPickle.HIGHEST_PROTOCOL))
+    self.assertEqual(four_square.get_name(), _.get_name())
+    self.assertEqual(four_square.get_all_symbol_shapes(),
+                     _.get_all_symbol_shapes())
+
 
 if __name__ == '__main__':
   unittest.main()
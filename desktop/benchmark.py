@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# Codec throughput benchmark. Encodes and decodes random payloads for every
+# symbol shape over a grid of payload lengths and JPEG qualities, all in
+# memory, and reports the results as JSON. With --baseline, compares against a
+# previously saved report and exits non-zero on a regression. Also exits
+# non-zero if resizing a small photo got slower (see check_resize).
+
+from Codec import Codec
+from ImageCoder import Base64MessageSymbolCoder, Base64SymbolSignalCoder
+from PIL import Image
+from SymbolShape import AVAILABLE_SHAPES
+from util import draft_resize
+import argparse
+import cStringIO
+import json
+import logging
+import multiprocessing
+import numpy
+import random
+import resource
+import sys
+import time
+
+logging.basicConfig(stream=sys.stderr, level=logging.WARNING,
+                    format='%(asctime)-15s %(levelname)8s %(module)10s '\
+                      '%(lineno)4d %(message)s')
+
+_HEADER = 'aesthete'
+
+# Metrics where larger is better.
+_THROUGHPUTS = ('encode_symbols_per_sec', 'decode_symbols_per_sec')
+
+# A small photo scaled down a little: draft_resize may take at most this
+# many times as long as the plain nearest neighbour resize it replaced.
+_SMALL_PHOTO = (1600, 1200)
+_SMALL_PHOTO_SCALE = .9
+_RESIZE_SLOWDOWN = 1.5
+
+
+def random_payload(length, seed):
+  generator = random.Random(seed)
+  values = Base64MessageSymbolCoder.values
+  return ''.join(generator.choice(values) for _ in xrange(length))
+
+
+def count_errors(expected, actual):
+  # Characters decoded wrongly, counting any missing or extra ones.
+  errors = sum(1 for a, b in zip(expected, actual) if a != b)
+  return errors + abs(len(expected) - len(actual))
+
+
+def run_case(shape_name, length, quality, repeat=3, decode_mode='RGB',
+             seed=0):
+  # Best-of-repeat timings for one (shape, length, quality) case.
+  symbol_shape = AVAILABLE_SHAPES[shape_name]
+  payload = random_payload(length, seed)
+  start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  result = {'shape': shape_name, 'length': length, 'quality': quality,
+            'decode_mode': decode_mode}
+
+  encode_seconds = decode_seconds = float('inf')
+  decoded = None
+  for _ in range(repeat):
+    codec = Codec(symbol_shape, 1.0, Base64MessageSymbolCoder(),
+                  Base64SymbolSignalCoder(), decode_mode=decode_mode)
+    start = time.time()
+    codec.encode(_HEADER + payload)
+    image = codec.get_result()
+    encode_seconds = min(encode_seconds, time.time() - start)
+
+    jpeg = cStringIO.StringIO()
+    image.save(jpeg, 'JPEG', quality=quality)
+    result['jpeg_bytes'] = jpeg.tell()
+    result['image_size'] = image.size
+    del image
+
+    jpeg.seek(0)
+    start = time.time()
+    try:
+      codec.decode(Image.open(jpeg))
+    except Exception, e:
+      result['error'] = str(e)
+      break
+    decode_seconds = min(decode_seconds, time.time() - start)
+    decoded = codec.get_result()
+    del codec
+
+  symbols = length * symbol_shape.get_num_symbol_shapes()
+  result['encode_symbols_per_sec'] = symbols / encode_seconds
+  result['encode_mb_per_sec'] = length / encode_seconds / 1e6
+  if decoded is None:
+    result['decode_symbols_per_sec'] = 0.
+    result['decode_mb_per_sec'] = 0.
+    result['symbol_error_rate'] = 1.
+  else:
+    result['decode_symbols_per_sec'] = symbols / decode_seconds
+    result['decode_mb_per_sec'] = length / decode_seconds / 1e6
+    # Each character is one Reed-Solomon symbol downstream.
+    result['symbol_error_rate'] = \
+        count_errors(payload, decoded) / float(length)
+  result['peak_memory_kb'] = \
+      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss
+  return result
+
+
+def _run_case_in_child(args):
+  return run_case(*args)
+
+
+def run(shape_names, lengths, qualities, repeat=3, decode_mode='RGB',
+        verbose=False):
+  # Each case runs in a fresh process so peak memory is per case.
+  cases = [(shape_name, length, quality, repeat, decode_mode)
+           for shape_name in shape_names
+           for length in lengths
+           for quality in qualities]
+  pool = multiprocessing.Pool(1, maxtasksperchild=1)
+  try:
+    results = []
+    for result in pool.imap(_run_case_in_child, cases):
+      if verbose:
+        print >> sys.stderr, (
+          '%(shape)s length %(length)d quality %(quality)d: encode '
+          '%(encode_symbols_per_sec).0f decode %(decode_symbols_per_sec).0f '
+          'symbols/sec.' % result)
+      results.append(result)
+  finally:
+    pool.close()
+    pool.join()
+  return results
+
+
+def time_resize(size, scale, repeat=5, seed=0):
+  # Best-of-repeat seconds to decode a JPEG photo of size and scale it, with
+  # draft_resize and with a plain nearest neighbour resize.
+  # Smooth gradients with some noise, roughly a photo's JPEG size.
+  state = numpy.random.RandomState(seed)
+  width, height = size
+  pixels = numpy.empty((height, width, 3))
+  pixels[:, :, 0] = numpy.linspace(0, 255, width)
+  pixels[:, :, 1] = numpy.linspace(0, 255, height)[:, numpy.newaxis]
+  pixels[:, :, 2] = 128
+  pixels += state.normal(0, 8, pixels.shape)
+  image = Image.fromarray(numpy.clip(pixels, 0, 255).astype(numpy.uint8))
+  del pixels
+  jpeg = cStringIO.StringIO()
+  image.save(jpeg, 'JPEG', quality=90)
+  del image
+  target = (int(round(width * scale)), int(round(height * scale)))
+
+  def seconds(resize):
+    jpeg.seek(0)
+    start = time.time()
+    resize(Image.open(jpeg), target).load()
+    return time.time() - start
+
+  # Alternated, so both see the same load on the machine.
+  draft = plain = float('inf')
+  for _ in range(repeat):
+    draft = min(draft, seconds(draft_resize))
+    plain = min(plain, seconds(
+      lambda image, target: image.resize(target, Image.NEAREST)))
+  return draft, plain
+
+
+def check_resize(repeat=5):
+  # Regressions of draft_resize on a small photo, as readable strings.
+  draft, plain = time_resize(_SMALL_PHOTO, _SMALL_PHOTO_SCALE, repeat)
+  if draft > plain * _RESIZE_SLOWDOWN:
+    return ['draft_resize of %dx%d by %.1f: %.3fs, plain resize %.3fs.' % (
+        _SMALL_PHOTO + (_SMALL_PHOTO_SCALE, draft, plain))]
+  return []
+
+
+def _case_key(result):
+  return (result['shape'], result['length'], result['quality'],
+          result.get('decode_mode', 'RGB'))
+
+
+def compare(baseline, current, tolerance=0.1):
+  # Regressions of current against baseline, as readable strings. Throughput
+  # may drop and memory may grow by the tolerance fraction; the error rate
+  # may not grow at all.
+  baseline = dict((_case_key(result), result) for result in baseline)
+  regressions = []
+  for result in current:
+    old = baseline.get(_case_key(result))
+    if old is None:
+      continue
+    name = '%s length %d quality %d %s' % _case_key(result)
+    for metric in _THROUGHPUTS:
+      if result[metric] < old[metric] * (1 - tolerance):
+        regressions.append('%s: %s %.0f -> %.0f.' % (
+            name, metric, old[metric], result[metric]))
+    if result['peak_memory_kb'] > old['peak_memory_kb'] * (1 + tolerance):
+      regressions.append('%s: peak_memory_kb %d -> %d.' % (
+          name, old['peak_memory_kb'], result['peak_memory_kb']))
+    if result['symbol_error_rate'] > old['symbol_error_rate']:
+      regressions.append('%s: symbol_error_rate %.4f -> %.4f.' % (
+          name, old['symbol_error_rate'], result['symbol_error_rate']))
+  return regressions
+
+
+def main(argv):
+  def int_list(value):
+    return [int(item) for item in value.split(',')]
+
+  parser = argparse.ArgumentParser(
+    prog='benchmark', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument('-s', '--shapes', type=str,
+                      default=','.join(sorted(AVAILABLE_SHAPES)),
+                      help='Comma-separated SymbolShapes to benchmark.')
+  parser.add_argument('-l', '--lengths', type=int_list,
+                      default='1000,10000,100000',
+                      help='Comma-separated payload lengths in characters.')
+  parser.add_argument('-q', '--qualities', type=int_list, default='95,85,75',
+                      help='Comma-separated JPEG qualities.')
+  parser.add_argument('-r', '--repeat', type=int, default=3,
+                      help='Runs per case; the fastest is reported.')
+  parser.add_argument('-m', '--decode_mode', type=str, default='RGB',
+                      choices=Codec.DECODE_MODES,
+                      help='Pixel format to decode symbols from.')
+  parser.add_argument('-o', '--output', type=str, default=None,
+                      help='File to write the JSON report to (else stdout).')
+  parser.add_argument('-b', '--baseline', type=str, default=None,
+                      help='Saved JSON report to compare against.')
+  parser.add_argument('-t', '--tolerance', type=float, default=0.1,
+                      help='Allowed fractional slowdown or memory growth.')
+  parser.add_argument('-v', '--verbose', action='store_true',
+                      help='Print each case as it finishes.')
+  FLAGS = parser.parse_args(argv[1:])
+
+  shape_names = FLAGS.shapes.split(',')
+  for shape_name in shape_names:
+    if shape_name not in AVAILABLE_SHAPES:
+      parser.error('Unknown shape: %s.' % shape_name)
+
+  results = run(shape_names, FLAGS.lengths, FLAGS.qualities, FLAGS.repeat,
+                FLAGS.decode_mode, FLAGS.verbose)
+  report = json.dumps(results, indent=2, sort_keys=True)
+  if FLAGS.output:
+    with open(FLAGS.output, 'w') as fh:
+      fh.write(report + '\n')
+  else:
+    print report
+
+  regressions = check_resize(FLAGS.repeat)
+  if FLAGS.baseline:
+    with open(FLAGS.baseline) as fh:
+      regressions += compare(json.load(fh), results, FLAGS.tolerance)
+  for regression in regressions:
+    logging.error(regression)
+  if regressions:
+    return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
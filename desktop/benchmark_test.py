@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+import benchmark
+import unittest
+
+class BenchmarkTest(unittest.TestCase):
+  def test_run_case(self):
+    result = benchmark.run_case('two_square', 500, 95, repeat=1)
+    self.assertEqual(0., result['symbol_error_rate'])
+    self.assertTrue(result['encode_symbols_per_sec'] > 0)
+    self.assertTrue(result['decode_mb_per_sec'] > 0)
+    self.assertFalse('error' in result)
+
+  def test_resize_small_photo(self):
+    draft, plain = benchmark.time_resize(
+      benchmark._SMALL_PHOTO, benchmark._SMALL_PHOTO_SCALE)
+    self.assertTrue(draft <= plain * benchmark._RESIZE_SLOWDOWN,
+                    '%.3fs against %.3fs' % (draft, plain))
+
+  def test_count_errors(self):
+    self.assertEqual(0, benchmark.count_errors('abcd', 'abcd'))
+    self.assertEqual(1, benchmark.count_errors('abcd', 'abed'))
+    self.assertEqual(2, benchmark.count_errors('abcd', 'ab'))
+
+  def test_compare(self):
+    baseline = [{'shape': 'two_square', 'length': 10, 'quality': 95,
+                 'encode_symbols_per_sec': 100., 'decode_symbols_per_sec': 100.,
+                 'peak_memory_kb': 100, 'symbol_error_rate': 0.}]
+    current = [dict(baseline[0], encode_symbols_per_sec=95.,
+                    peak_memory_kb=105)]
+    self.assertEqual([], benchmark.compare(baseline, current, 0.1))
+
+    current = [dict(baseline[0], decode_symbols_per_sec=50.,
+                    symbol_error_rate=0.01)]
+    regressions = benchmark.compare(baseline, current, 0.1)
+    self.assertEqual(2, len(regressions))
+    self.assertTrue('decode_symbols_per_sec' in regressions[0])
+    self.assertTrue('symbol_error_rate' in regressions[1])
+
+
+if __name__ == '__main__':
+  unittest.main()
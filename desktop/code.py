@@ -7,6 +7,7 @@ from ECCoder import ECCoder
 from Cipher import Cipher
 from PIL import Image, ImageDraw
 from tempfile import NamedTemporaryFile
+from util import draft_resize
 import PIL
 import Queue
 import base64
@@ -43,7 +44,8 @@ gflags.DEFINE_integer('maxdim', 2048,
 gflags.DEFINE_boolean('enable_diff', False, 'slow diff coordinates image')
 gflags.DEFINE_string('password', None, 'Password to encrypt image with.',
                      short_name = 'p')
-gflags.DEFINE_integer('threads', 1, 'number of threads', short_name = 't')
+gflags.DEFINE_integer('threads', 1, 'number of ECC worker processes',
+                      short_name = 't')
 gflags.DEFINE_boolean('extra_logs', False, 'write extra logs')
 
 gflags.DEFINE_boolean('ecc', False, 'Use ECC encoding.')
@@ -115,8 +117,10 @@ class SeeMeNotImage(threading.Thread):
   def rescale(self):
     width, height = self.image.size
     # scale = ((2048 * 2048) / 5.) / (width * height)
-    self.image = self.image.resize(
-      (int(width * self.scale), int(height * self.scale)))
+    # Decodes a JPEG at a reduced DCT scale when scale allows; see
+    # draft_resize.
+    self.image = draft_resize(
+      self.image, (int(width * self.scale), int(height * self.scale)))
     logging.info('Rescaled image size: (%d x %d)' % self.image.size)
 
   def requality(self, quality):
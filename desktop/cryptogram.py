@@ -5,35 +5,27 @@
 # DCT). Of course, we must find a way to reengineer this application. Notably,
 # the last row will be unrecoverable especially if resizing is involved.
 
-from Cipher.PyV8Cipher import V8Cipher as Cipher
+from Cipher.SJCLCipher import SJCLCipher as Cipher
 from Codec import Codec
 from Encryptor import Encrypt
 from ImageCoder import Base64MessageSymbolCoder, Base64SymbolSignalCoder
 from PIL import Image
-from SymbolShape import four_square, three_square, two_square, one_square, two_by_four, two_by_three, two_by_one
+from PayloadHeader import PayloadHeader
+from SymbolShape import AVAILABLE_SHAPES
 from json import JSONEncoder
-from util import sha256hash
+from util import IntegrityStream, base64_byte_confidence
 import Orientation
 import argparse
 import base64
 import cStringIO
 import logging
 import sys
-import time
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO,
                     format='%(asctime)-15s %(levelname)8s %(module)10s '\
                       '%(threadName)10s %(thread)16d %(lineno)4d %(message)s')
 
-_AVAILABLE_SHAPES = {
-  'four_square' : four_square,
-  'three_square': three_square,
-  'two_square' : two_square,
-  'one_square' : one_square,
-  'two_by_four' : two_by_four,
-  'two_by_three' : two_by_three,
-  'two_by_one' : two_by_one,
-}
+_AVAILABLE_SHAPES = AVAILABLE_SHAPES
 
 def main(argv):
 
@@ -56,6 +48,20 @@ def main(argv):
                       help='Maximum image dimension (applies to height and width).')
   parser.add_argument('-w', '--fixed_width', type=int, default=None,
                       help='Exact width specification.')
+  parser.add_argument('-j', '--workers', type=int, default=1,
+                      help='Number of processes to decode with.')
+  parser.add_argument('-v', '--payload_version', type=int,
+                      default=Encrypt.PAYLOAD_VERSION, choices=(1, 2),
+                      help='Payload format to encrypt to; version 2 is '
+                      'smaller but only this tool decodes it (see Encryptor).')
+  parser.add_argument('--ecc', action='store_true',
+                      help='Protect the payload with Reed-Solomon ECC planned '
+                      'for --quality from measured error rates (see '
+                      'ECCPlanner). Only this tool decodes such images.')
+  parser.add_argument('-l', '--decode_mode', type=str, default='RGB',
+                      choices=Codec.DECODE_MODES,
+                      help='Pixel format to decode symbols from; L reads the '
+                      'JPEG luminance plane directly.')
   FLAGS = parser.parse_args()
 
   symbol_shape = _AVAILABLE_SHAPES[FLAGS.symbol_shape]
@@ -90,22 +96,16 @@ def main(argv):
     codec = Codec(symbol_shape, wh_ratio, Base64MessageSymbolCoder(),
                   Base64SymbolSignalCoder(), fixed_width = FLAGS.fixed_width)
 
-    crypto = Encrypt(image_buffer, codec, cipher)
+    crypto = Encrypt(image_buffer, codec, cipher, FLAGS.payload_version,
+                     ecc_quality=quality if FLAGS.ecc else None)
     encrypted_data = crypto.upload_encrypt(FLAGS.max_output_dimension)
     logging.info('Encrypted data length: %d.' % len(encrypted_data))
+    logging.info('Payload header: %s.' % crypto.header)
 
-    # TODO(tierney): Set somewhere more appropriately.
-    header = 'aesthete'
-
-    codec.set_direction('encode')
-    codec.set_data(header + encrypted_data)
-    codec.start()
-    while True:
-      im = codec.get_result()
-      if im: break
-      logging.info('Progress: %.2f%%.' % \
-                     (100. * codec.get_percent_complete()))
-      time.sleep(0.5)
+    def log_progress(percent):
+      logging.info('Progress: %.2f%%.' % (100. * percent))
+    im = codec.submit('encode', crypto.payload(encrypted_data),
+                      progress_callback=log_progress).result()
 
     logging.info('Saving encrypted jpeg with quality %d.' % quality)
     with open(FLAGS.encrypt, 'w') as out_file:
@@ -133,40 +133,35 @@ def main(argv):
     _width, _height = read_back_image.size
     wh_ratio = _width / float(_height)
 
-  codec = Codec(symbol_shape, wh_ratio, Base64MessageSymbolCoder(),
-                Base64SymbolSignalCoder())
-
-  codec.set_direction('decode')
-  codec.set_data(read_back_image)
-  codec.start()
-  while True:
-    binary_decoding = codec.get_result()
-    if binary_decoding: break
-    logging.info('Progress: %.2f%%.' % \
-                   (100. * codec.get_percent_complete()))
-    time.sleep(0.5)
+  try:
+    header, chunks = read_payload(read_back_image, symbol_shape, wh_ratio,
+                                  FLAGS.workers, FLAGS.decode_mode)
+  except ValueError, e:
+    logging.error(e)
+    return 1
+
+  # Hash the payload as it is decoded. The cipher needs the whole
+  # ciphertext, so what follows the check is collected once here.
+  integrity_stream = IntegrityStream()
+  binary_decoding = ''.join([integrity_stream.update(chunk)
+                             for chunk in chunks])
+  del chunks
+  _integrity_check = integrity_stream.extracted_check
 
   if FLAGS.encrypt and FLAGS.decrypt:
     logging.info('Byte for byte diff: %d.' % \
-                   byte_for_byte_compare(encrypted_data, binary_decoding))
-
-  # Required "un"-filtering to base64 data.
-  def _base64_pad(s):
-    mod = len(s) % 4
-    if mod == 0: return s
-    return s + (4 - mod) * '='
-
-  # padded_decoding = _base64_pad(binary_decoding)
-  _integrity_check = binary_decoding[0:64]
-  _to_check = binary_decoding[64:]
-  logging.info('Input to integrity check: %s...' % _to_check[:48])
-  integrity_check_value = sha256hash(_to_check)
+                   byte_for_byte_compare(encrypted_data,
+                                         _integrity_check + binary_decoding))
+
+  logging.info('Input to integrity check: %s...' % binary_decoding[:48])
+  integrity_check_value = integrity_stream.hexdigest()
   logging.info('Extracted integrity check: %s.' % _integrity_check)
   logging.info('Calculated integrity check: %s.' % integrity_check_value)
 
-  _iv = binary_decoding[64:86]
-  _salt = binary_decoding[86:97]
-  _ct = binary_decoding[97:]
+  _iv = binary_decoding[:22]
+  _salt = binary_decoding[22:33]
+  _ct = binary_decoding[33:]
+  del binary_decoding
 
   decoded = {'iv':_iv, 'salt':_salt, 'ct':_ct}
   json_str = JSONEncoder().encode(decoded)
@@ -176,8 +171,11 @@ def main(argv):
   else:
     logging.info('Integrity check passed.')
 
-  decrypted_decoded = cipher.decode(json_str)
-  extracted_data = base64.b64decode(decrypted_decoded)
+  if header.version == 1:
+    decrypted_decoded = cipher.decode(json_str)
+    extracted_data = base64.b64decode(decrypted_decoded)
+  else:
+    extracted_data = cipher.decode_bytes(json_str)
 
   if FLAGS.image and FLAGS.decrypt:
     with open(FLAGS.decrypt, 'wb') as fh:
@@ -185,6 +183,54 @@ def main(argv):
     logging.info('Saved decrypted file: %s.' % FLAGS.decrypt)
 
 
+# Required "un"-filtering to base64 data.
+def _base64_pad(s):
+  mod = len(s) % 4
+  if mod == 0: return s
+  return s + (4 - mod) * '='
+
+
+def read_payload(read_image, symbol_shape, wh_ratio, num_workers=1,
+                 decode_mode='RGB'):
+  # Decodes the payload painted in read_image. Returns its PayloadHeader and
+  # the chunks of the payload after the header (the integrity check, then
+  # what it covers), ECC decoded if the header says so. Raises ValueError
+  # for a header of ours that fails its check; any other unknown header is
+  # read as 'aesthete', which older decoders never checked.
+  def new_codec(with_confidence=False):
+    return Codec(symbol_shape, wh_ratio, Base64MessageSymbolCoder(),
+                 Base64SymbolSignalCoder(), num_workers=num_workers,
+                 decode_mode=decode_mode, with_confidence=with_confidence)
+
+  # The header says how to read the rest.
+  codec = new_codec()
+  codec.decode_header(read_image)
+  header = PayloadHeader.parse(codec.header)
+  if header is None:
+    if PayloadHeader.damaged(codec.header):
+      raise ValueError('Damaged header %r.' % codec.header)
+    logging.warning('Unknown header %r; reading it as %r.' %
+                    (codec.header, PayloadHeader.LEGACY))
+    header = PayloadHeader()
+  logging.info('Payload header: %r.' % header)
+
+  ecc_coder = header.ecc_coder(num_workers)
+  if ecc_coder is None:
+    if num_workers > 1:
+      codec.decode(read_image)
+      return header, [codec.get_result()]
+    return header, codec.decode_bands(read_image)
+
+  # An ECC coded payload is painted as base64 and decoded whole. Its bytes
+  # least clearly read are tried as erasures, which cost half the parity of
+  # errors.
+  codec = new_codec(with_confidence=True)
+  codec.decode(read_image)
+  message = base64.b64decode(_base64_pad(codec.get_result()))
+  confidence = base64_byte_confidence(codec.confidence, len(message))
+  return header, [ecc_coder.decode(message, confidence)]
+
+
 def byte_for_byte_compare(a, b):
   errors = 0
   for i, datum in enumerate(a[:min(len(a), len(b))]):
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+from Codec import Codec
+from ECCoder import ECCoder
+from ImageCoder import Base64MessageSymbolCoder, Base64SymbolSignalCoder
+from PIL import Image
+from PayloadHeader import PayloadHeader
+from SymbolShape import two_square
+import base64
+import cryptogram
+import numpy
+import random
+import unittest
+
+class ReadPayloadTest(unittest.TestCase):
+  def setUp(self):
+    self.payload = 'AB/9xyz0' * 50
+
+  def paint(self, header, damaged=()):
+    # The image Codec paints for header + payload, with the header
+    # characters at the damaged indices painted over with the first one.
+    codec = Codec(two_square, 1.0, Base64MessageSymbolCoder(),
+                  Base64SymbolSignalCoder())
+    codec.encode(header + self.payload)
+    pixels = numpy.array(codec.get_result())
+    for index in damaged:
+      # Header characters are 4x2 pixels, two to a row.
+      top, left = 2 * (index // 2), 4 * (index % 2)
+      pixels[top:top + 2, left:left + 4] = pixels[:2, :4]
+    return Image.fromarray(pixels)
+
+  def read(self, image):
+    header, chunks = cryptogram.read_payload(image, two_square, 1.0)
+    return header, ''.join(chunks)[:len(self.payload)]
+
+  def test_legacy(self):
+    header, payload = self.read(self.paint(PayloadHeader.LEGACY))
+    self.assertEqual('aesthete', str(header))
+    self.assertEqual(self.payload, payload)
+
+  def test_damaged_legacy_header(self):
+    image = self.paint(PayloadHeader.LEGACY, damaged=(1, 6))
+    header, payload = self.read(image)
+    self.assertEqual((1, 0), (header.version, header.n))
+    self.assertEqual(self.payload, payload)
+
+  def test_damaged_header(self):
+    header = str(PayloadHeader(2))
+    self.assertEqual(2, self.read(self.paint(header))[0].version)
+    self.assertRaises(ValueError, self.read, self.paint(header, damaged=(3,)))
+
+  def test_erasures(self):
+    # Twelve characters read doubtfully at the start of the payload spoil
+    # nine bytes of its first codeword, more than the eight errors 32,16
+    # corrects, but not once the least confident of them are erased.
+    generator = random.Random(0)
+    data = ''.join(chr(generator.randint(0, 255)) for _ in xrange(1024))
+    coder = ECCoder(32, 16)
+    header = str(PayloadHeader.from_ecc_coder(1, coder))
+    self.payload = base64.b64encode(coder.encode(data)).rstrip('=')
+    pixels = numpy.array(self.paint(header), dtype=numpy.int16)
+    # Beside the header, payload characters are 4x2 pixels in a row. Pull
+    # each symbol most of the way to the next level towards the middle.
+    doubtful = pixels[:2, 8:8 + 4 * 12]
+    doubtful += numpy.where(doubtful < 126, 16, -16)
+    image = Image.fromarray(pixels.astype(numpy.uint8))
+
+    header, chunks = cryptogram.read_payload(image, two_square, 1.0)
+    self.assertEqual((32, 16), (header.n, header.k))
+    self.assertEqual(data, ''.join(chunks))
+
+    codec = Codec(two_square, 1.0, Base64MessageSymbolCoder(),
+                  Base64SymbolSignalCoder())
+    codec.decode(image)
+    message = base64.b64decode(cryptogram._base64_pad(codec.get_result()))
+    self.assertNotEqual(data, coder.decode(message))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,130 @@
+# encoding: UTF-8
+"""Table-driven arithmetic in GF(2^8) on plain ints.
+
+This is the same field as ff.GF256int (reduction polynomial
+x^8 + x^4 + x^3 + x + 1, generator 3), but elements are ordinary ints in
+0..255 and polynomials are bytearrays of coefficients in order of decreasing
+power, like polynomial.Polynomial. Unlike Polynomial, leading zero
+coefficients are kept, so a codeword and its polynomial are the same buffer.
+
+GF256int and Polynomial remain the reference implementation; everything here
+must agree with them.
+"""
+
+from ff import GF256int
+
+# EXP[i] is 3^i. The table is doubled so EXP[LOG[a] + LOG[b]] needs no % 255.
+EXP = bytearray(GF256int.exptable[i % 255] for i in xrange(512))
+
+# LOG[a] is the base-3 logarithm of a. LOG[0] is meaningless (zero has no
+# logarithm) and must be special-cased by callers.
+LOG = [0] + list(GF256int.logtable[1:])
+
+# MUL[a][b] is a * b. Each row is a 256-byte translation table, so
+# buffer.translate(MUL[a]) scales a whole polynomial by a.
+MUL = [bytearray(256)]
+for _a in xrange(1, 256):
+  MUL.append(bytearray([0]) +
+             bytearray(EXP[LOG[_a] + LOG[_b]] for _b in xrange(1, 256)))
+del _a
+
+# INV[a] is the multiplicative inverse of a. INV[0] is meaningless.
+INV = bytearray([0]) + bytearray(EXP[255 - LOG[a]] for a in xrange(1, 256))
+
+
+def mul(a, b):
+  return MUL[a][b]
+
+def div(a, b):
+  if not b:
+    raise ZeroDivisionError("division by zero in GF(2^8)")
+  return MUL[a][INV[b]]
+
+def inverse(a):
+  if not a:
+    raise ZeroDivisionError("zero has no inverse in GF(2^8)")
+  return INV[a]
+
+def power(a, n):
+  """a raised to the integer power n"""
+  if not a:
+    if n > 0:
+      return 0
+    raise ZeroDivisionError("zero raised to a non-positive power")
+  return EXP[(LOG[a] * n) % 255]
+
+
+def poly_strip(p):
+  """Returns p without its leading zero coefficients (at least one
+  coefficient is kept)"""
+  for i, c in enumerate(p):
+    if c:
+      return p[i:]
+  return p[-1:] or bytearray(1)
+
+def poly_scale(p, x):
+  """Returns x * p"""
+  return bytearray(p).translate(MUL[x])
+
+def poly_add(p, q):
+  """Returns p + q (which is also p - q)"""
+  if len(p) < len(q):
+    p, q = q, p
+  result = bytearray(p)
+  offset = len(p) - len(q)
+  for i, c in enumerate(q):
+    result[offset + i] ^= c
+  return result
+
+def poly_mul_acc(acc, p, x, shift=0):
+  """Adds x * p * z^shift into acc in place. acc must be long enough to hold
+  the product; it is aligned on its lowest-order coefficient."""
+  if not x:
+    return acc
+  row = MUL[x]
+  offset = len(acc) - len(p) - shift
+  for i, c in enumerate(p):
+    if c:
+      acc[offset + i] ^= row[c]
+  return acc
+
+def poly_mul(p, q):
+  """Returns p * q"""
+  result = bytearray(len(p) + len(q) - 1)
+  shift = len(p) - 1
+  for c in p:
+    poly_mul_acc(result, q, c, shift)
+    shift -= 1
+  return result
+
+def poly_eval(p, x):
+  """Evaluates p at x with Horner's rule"""
+  row = MUL[x]
+  y = 0
+  for c in p:
+    y = row[y] ^ c
+  return y
+
+def poly_divmod(dividend, divisor):
+  """Returns (quotient, remainder) of the polynomial division. The remainder
+  always has len(divisor) - 1 coefficients."""
+  divisor = poly_strip(divisor)
+  if not divisor[0]:
+    raise ZeroDivisionError("polynomial division by zero")
+  degree = len(divisor) - 1
+  if len(dividend) <= degree:
+    return bytearray(1), bytearray(degree - len(dividend)) + dividend
+
+  # Synthetic division against the monic divisor: the running buffer holds
+  # the quotient followed by the remainder.
+  lead = INV[divisor[0]]
+  monic = poly_scale(divisor, lead)
+  buf = bytearray(dividend)
+  for i in xrange(len(dividend) - degree):
+    coefficient = buf[i]
+    if coefficient:
+      row = MUL[coefficient]
+      for j in xrange(1, degree + 1):
+        buf[i + j] ^= row[monic[j]]
+  quotient = poly_scale(buf[:len(dividend) - degree], lead)
+  return quotient, buf[len(dividend) - degree:]
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+from ff import GF256int
+from polynomial import Polynomial
+import gf256
+import random
+import unittest
+
+def _reference(p):
+  return Polynomial(GF256int(c) for c in p)
+
+def _bytes(polynomial):
+  return bytearray(polynomial.coefficients)
+
+class GF256Test(unittest.TestCase):
+  def test_field_matches_gf256int(self):
+    for a in range(256):
+      for b in range(256):
+        self.assertEqual(GF256int(a) * GF256int(b), gf256.mul(a, b))
+      if a:
+        self.assertEqual(GF256int(a).inverse(), gf256.inverse(a))
+        self.assertEqual(GF256int(a) ** 7, gf256.power(a, 7))
+        self.assertEqual(GF256int(200) / GF256int(a), gf256.div(200, a))
+
+  def test_zero(self):
+    self.assertRaises(ZeroDivisionError, gf256.inverse, 0)
+    self.assertRaises(ZeroDivisionError, gf256.div, 1, 0)
+    self.assertEqual(0, gf256.power(0, 3))
+
+  def test_polynomials_match_reference(self):
+    generator = random.Random(0)
+    for _ in range(50):
+      p = bytearray(generator.randint(1, 255) for _ in range(
+          generator.randint(1, 12)))
+      q = bytearray(generator.randint(0, 255) for _ in range(
+          generator.randint(1, 6)))
+      q[0] = generator.randint(1, 255)
+      x = generator.randint(0, 255)
+
+      self.assertEqual(_bytes(_reference(p) * _reference(q)),
+                       gf256.poly_strip(gf256.poly_mul(p, q)))
+      self.assertEqual(_bytes(_reference(p) + _reference(q)),
+                       gf256.poly_strip(gf256.poly_add(p, q)))
+      self.assertEqual(_reference(p).evaluate(GF256int(x)),
+                       gf256.poly_eval(p, x))
+
+      quotient, remainder = gf256.poly_divmod(p, q)
+      reference_quotient, reference_remainder = divmod(_reference(p),
+                                                       _reference(q))
+      self.assertEqual(len(q) - 1, len(remainder))
+      self.assertEqual(_bytes(reference_quotient), gf256.poly_strip(quotient))
+      self.assertEqual(_bytes(reference_remainder),
+                       gf256.poly_strip(remainder))
+
+  def test_poly_mul_acc(self):
+    acc = bytearray((1, 2, 3, 4))
+    gf256.poly_mul_acc(acc, bytearray((5, 6)), 7, shift=1)
+    expected = gf256.poly_add(bytearray((1, 2, 3, 4)),
+                              gf256.poly_scale(bytearray((5, 6, 0)), 7))
+    self.assertEqual(expected, acc)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -3,7 +3,11 @@
 # See LICENSE.txt for license terms
 
 from ff import GF256int
+from gf256 import EXP, LOG, MUL
 from polynomial import Polynomial
+import binascii
+import gf256
+import numpy
 
 """This module implements Reed-Solomon Encoding.
 It supports arbitrary configurations for n and k, the codeword length and
@@ -25,9 +29,469 @@ with leading null bytes if necessary) and then 32 bytes of parity data.
 Use the -d flag to decode data on standard in to standard out. This reads in
 blocks of 255 bytes, and outputs the decoded data from them. If there are less
 than 16 errors per block, your data will be recovered.
+
+RSCoder does its arithmetic with the integer tables in gf256. The original
+GF256int/Polynomial implementation is kept as PolynomialRSCoder, the reference
+that RSCoder must agree with.
 """
 
+# MUL as an array, for multiplying whole arrays of field elements at once.
+_MUL = numpy.frombuffer(str(bytearray().join(MUL)),
+                        dtype=numpy.uint8).reshape(256, 256)
+
 class RSCoder(object):
+  def __init__(self, n, k):
+    """Creates a new Reed-Solomon Encoder/Decoder object configured with
+    the given n and k values.
+    n is the length of a codeword, must be less than 256
+    k is the length of the message, must be less than n
+
+    The code will have error correcting power s where 2s = n - k
+
+    The typical RSCoder is RSCoder(255, 223)
+    """
+    if n < 0 or k < 0:
+      raise ValueError("n and k must be positive")
+    if not n < 256:
+      raise ValueError("n must be at most 255")
+    if not k < n:
+      raise ValueError("Codeword length n must be greater than message"
+          " length k")
+    self.n = n
+    self.k = k
+
+    # Generate the generator polynomial for RS codes
+    # g(x) = (x-α^1)(x-α^2)...(x-α^(n-k))
+    # α is 3, a generator for GF(2^8)
+    g = bytearray((1,))
+    for alpha in xrange(1,n-k+1):
+      g = gf256.poly_mul(g, bytearray((1, EXP[alpha])))
+    self.g = g
+
+    # h(x) = (x-α^(n-k+1))...(x-α^n)
+    h = bytearray((1,))
+    for alpha in xrange(n-k+1,n+1):
+      h = gf256.poly_mul(h, bytearray((1, EXP[alpha])))
+    self.h = h
+
+    # Parity is computed in an n-k byte shift register held as one long
+    # integer. _feedback[f] is the register contribution of feedback byte f,
+    # i.e. f times g without its leading (monic) coefficient.
+    self._feedback = tuple(
+      int(binascii.hexlify(gf256.poly_scale(g[1:], f)), 16)
+      for f in xrange(256))
+
+    # The same feedback as rows of an array, for encode_many/decode_many.
+    self._feedback_rows = _MUL[:, numpy.frombuffer(str(g[1:]),
+                                                   dtype=numpy.uint8)]
+
+  def encode(self, message, poly=False):
+    """Encode a given string with reed-solomon encoding. Returns a byte
+    string with the k message bytes and n-k parity bytes at the end.
+
+    If a message is < k bytes long, it is assumed to be padded at the front
+    with null bytes.
+
+    The sequence returned is always n bytes long.
+
+    If poly is not False, returns the encoded Polynomial object instead of
+    the polynomial translated back to a string (useful for debugging)
+    """
+    n = self.n
+    k = self.k
+
+    if len(message)>k:
+      raise ValueError("Message length is max %d. Message was %d" % (k,
+        len(message)))
+
+    # Message followed by the remainder of dividing message * x^(n-k) by g is
+    # a multiple of g.
+    c = str(message).rjust(k, "\0") + self._parity(message)
+
+    if poly:
+      return Polynomial(GF256int(ord(x)) for x in c)
+
+    return c
+
+  def encode_many(self, messages):
+    """Encodes a 2-D uint8 array holding one k byte message per row,
+    returning the array of n byte codewords
+    """
+    messages = self._blocks(messages, self.k)
+    codes = self._divide_many(numpy.hstack(
+      (messages, numpy.zeros((len(messages), self.n - self.k),
+                             dtype=numpy.uint8))))
+    codes[:, :self.k] = messages
+    return codes
+
+  def decode_many(self, codes, erasures=None):
+    """Decodes a 2-D uint8 array holding one n byte codeword per row,
+    returning the array of k byte messages. Unlike decode, leading null bytes
+    are never stripped. Messages with too many errors to correct are
+    returned as received.
+
+    erasures, if given, is a boolean array of the same shape as codes marking
+    the bytes known to be unreliable; see decode.
+    """
+    codes = self._blocks(codes, self.n)
+    if erasures is not None:
+      erasures = numpy.asarray(erasures, dtype=bool)
+      if erasures.shape != codes.shape:
+        raise ValueError("erasures must have the shape of codes")
+    messages = codes[:, :self.k].copy()
+
+    for row, syndromes in self._damaged(codes):
+      c = bytearray(codes[row].tostring())
+      row_erasures = () if erasures is None else \
+          numpy.flatnonzero(erasures[row]).tolist()
+      if self._correct(c, syndromes, row_erasures) is not None:
+        messages[row] = numpy.frombuffer(str(c[:self.k]), dtype=numpy.uint8)
+    return messages
+
+  def decode_many_soft(self, codes, confidence, max_erasures=None):
+    """Like decode_many, but given confidence, an array of the same shape as
+    codes rating how likely each byte is to be right (higher is likelier).
+
+    This is generalized minimum distance decoding: a codeword with too many
+    errors to correct is retried with its 2, 4, ... max_erasures least
+    confident bytes erased, until a trial decodes. An erasure costs half as
+    much parity as an error, so this recovers codewords whose errors are
+    concentrated among their least confident bytes.
+
+    Every trial is another chance to decode to the wrong codeword, and with
+    close to n-k erasures nearly any received word decodes to something, so
+    max_erasures defaults to (n-k)/4.
+    """
+    if max_erasures is None:
+      max_erasures = (self.n - self.k) // 4
+    codes = self._blocks(codes, self.n)
+    confidence = numpy.asarray(confidence)
+    if confidence.shape != codes.shape:
+      raise ValueError("confidence must have the shape of codes")
+    messages = codes[:, :self.k].copy()
+
+    for row, syndromes in self._damaged(codes):
+      received = bytearray(codes[row].tostring())
+      c = bytearray(received)
+      if self._correct(c, syndromes) is None:
+        order = confidence[row].argsort(kind='mergesort').tolist()
+        for num_erasures in xrange(2, max_erasures + 1, 2):
+          c = bytearray(received)
+          if self._correct(c, syndromes, order[:num_erasures]) is not None:
+            break
+        else:
+          continue
+      messages[row] = numpy.frombuffer(str(c[:self.k]), dtype=numpy.uint8)
+    return messages
+
+  def _damaged(self, codes):
+    """Yields (row, syndromes) for each codeword in codes that is not valid.
+    Only the codewords with a nonzero remainder (nonzero syndromes) need the
+    scalar error correction; in practice that is few of them.
+    """
+    n = self.n
+    k = self.k
+    remainders = self._divide_many(codes)[:, k:]
+    damaged = numpy.flatnonzero(remainders.any(axis=1))
+    if not len(damaged):
+      return
+
+    # s_l is the remainder evaluated at α^l, by Horner's rule on every
+    # damaged codeword at once.
+    points = numpy.frombuffer(str(EXP[1:n-k+1]), dtype=numpy.uint8)
+    syndromes = numpy.zeros((len(damaged), n-k), dtype=numpy.uint8)
+    for column in remainders[damaged].T:
+      syndromes = _MUL[syndromes, points] ^ column[:, numpy.newaxis]
+
+    for row, row_syndromes in zip(damaged, syndromes):
+      yield row, row_syndromes.tolist()
+
+  def _blocks(self, blocks, length):
+    blocks = numpy.asarray(blocks, dtype=numpy.uint8)
+    if blocks.ndim != 2 or blocks.shape[1] != length:
+      raise ValueError("Expected an array of %d byte rows, got shape %s" % (
+        length, blocks.shape))
+    return blocks
+
+  def _divide_many(self, dividends):
+    """Synthetic division by g of every row of dividends, which must be n
+    bytes wide. Returns a new array whose last n-k columns are the
+    remainders.
+    """
+    width = self.n - self.k
+    feedback = self._feedback_rows
+    work = dividends.copy()
+    for i in xrange(self.k):
+      work[:, i+1:i+1+width] ^= feedback[work[:, i]]
+    return work
+
+  def _register(self, message):
+    """Runs the message bytes through the n-k byte linear feedback shift
+    register, returning its final contents as a long integer: the remainder
+    of message * x^(n-k) divided by g
+    """
+    width = self.n - self.k
+    top = 8 * (width - 1)
+    mask = (1 << 8 * width) - 1
+    feedback = self._feedback
+
+    register = 0
+    for byte in bytearray(message):
+      register = ((register << 8) & mask) ^ feedback[(register >> top) ^ byte]
+    return register
+
+  def _parity(self, message):
+    """Returns the n-k parity bytes for message"""
+    width = self.n - self.k
+    return binascii.unhexlify("%0*x" % (2 * width, self._register(message)))
+
+  def _remainder(self, code):
+    """Returns the remainder of code divided by g as a long integer. For a
+    code with message part m and parity part b it is the parity of m plus b,
+    so a single pass over the code suffices.
+    """
+    width = self.n - self.k
+    code = bytearray(code)
+    if len(code) < width:
+      code = code.rjust(width, "\0")
+    return self._register(code[:-width]) ^ \
+        int(binascii.hexlify(code[-width:]), 16)
+
+  def verify(self, code):
+    """Verifies the code is valid by testing that the code as a polynomial
+    code divides g
+    returns True/False
+    """
+    # Since all codewords are multiples of g, checking that code divides g
+    # suffices for validating a codeword.
+    return not self._remainder(code)
+
+  def decode(self, r, nostrip=False, erasures=()):
+    """Given a received string or byte array r, attempts to decode it. If
+    it's a valid codeword, or if there are no more than (n-k)/2 errors, the
+    message is returned.
+
+    erasures are the indices into r of bytes known to be unreliable. An
+    erasure costs half the parity an error of unknown position does: r is
+    decoded as long as 2 * errors + erasures <= n-k.
+
+    A message always has k bytes, if a message contained less it is left
+    padded with null bytes. When decoded, these leading null bytes are
+    stripped, but that can cause problems if decoding binary data. When
+    nostrip is True, messages returned are always k bytes long. This is
+    useful to make sure no data is lost when decoding binary data.
+
+    If there are too many errors to correct, the message part of r is
+    returned as received.
+    """
+    n = self.n
+    k = self.k
+
+    syndromes = self._syndromes(r)
+    if syndromes is None:
+      # The last n-k bytes are parity
+      if nostrip:
+        return r[:-(n-k)]
+      else:
+        return r[:-(n-k)].lstrip("\0")
+
+    c = bytearray(r).rjust(n, "\0")
+    offset = n - len(r)
+    self._correct(c, syndromes, [offset + i for i in erasures])
+
+    ret = str(c[:k])
+    if nostrip:
+      return ret
+    else:
+      return ret.lstrip("\0")
+
+  def _correct(self, c, syndromes, erasures=()):
+    """Corrects the n byte codeword c in place given its nonzero syndromes
+    and the indices into c of its erased bytes. Returns the number of errors
+    and erasures corrected, or None (leaving c untouched) if there are too
+    many to correct.
+    """
+    width = self.n - self.k
+    erasures = sorted(set(erasures))
+    if len(erasures) > width:
+      return None
+
+    # The erasure locator, Product( 1 - X_i * z ) over the erased locations.
+    # It seeds Berlekamp-Massey, which then only has to find the errors.
+    gamma = bytearray([1])
+    for i in erasures:
+      gamma = gf256.poly_mul(gamma, bytearray([1, EXP[self.n - 1 - i]]))
+
+    # Find the error-and-erasure locator polynomial and error evaluator
+    # polynomial using the Berlekamp-Massey algorithm
+    sigma, omega = self._berlekamp_massey(syndromes, list(gamma))
+    num_errors = len(sigma) - 1 - len(erasures)
+    if len(sigma) == 1 or num_errors < 0 or \
+        2 * num_errors + len(erasures) > width:
+      return None
+
+    # Now use Chien's procedure to find the error positions, 0 being the
+    # rightmost byte
+    j = self._chien_search(sigma)
+    if j is None:
+      return None
+
+    # And finally, find the error magnitudes with Forney's Formula
+    Y = self._forney(sigma, omega, j)
+    if Y is None:
+      return None
+
+    last = self.n - 1
+    for position, magnitude in zip(j, Y):
+      c[last - position] ^= magnitude
+    return len(j)
+
+  def _syndromes(self, r):
+    """Given the received codeword r, computes the syndromes s_1..s_(n-k),
+    or returns None if they are all zero (r is a valid codeword)
+    """
+    width = self.n - self.k
+
+    # s_l is r evaluated at α^l, and g(α^l) is zero, so s_l is also the
+    # remainder of r divided by g evaluated at α^l. That remainder comes out
+    # of one pass of the shift register and is only n-k bytes long.
+    remainder = self._remainder(r)
+    if not remainder:
+      return None
+    remainder = bytearray(binascii.unhexlify("%0*x" % (2 * width, remainder)))
+    return [gf256.poly_eval(remainder, EXP[l]) for l in xrange(1, width + 1)]
+
+  def _berlekamp_massey(self, syndromes, erasure_locator=(1,)):
+    """Computes and returns the error locator polynomial (sigma) and the
+    error evaluator polynomial (omega), as lists of coefficients in order of
+    increasing power. Given the locator of the known erasures (in the same
+    form), sigma locates the erasures as well as the errors.
+
+    Error locator polynomial:
+    sigma(z) = Product( 1 - X_i * z, i=1..s )
+    roots are the reciprocals of the error locations X_i = α^(j_i)
+
+    Error evaluator polynomial:
+    omega(z) = s(z) * sigma(z) mod z^(n-k), where s(z) = sum(s_i * z^(i-1))
+    """
+    # Only the current locator and the one from the last length change are
+    # kept. Starting from the erasure locator, the first e syndromes are
+    # already accounted for.
+    e = len(erasure_locator) - 1
+    sigma = list(erasure_locator)
+    previous = list(erasure_locator)
+    length = e
+    previous_discrepancy = 1
+    shift = 1
+
+    for i in xrange(e, len(syndromes)):
+      s = syndromes[i]
+      # The discrepancy between s_(i+1) and what sigma predicts from the
+      # earlier syndromes
+      discrepancy = s
+      for l in xrange(1, min(i, len(sigma) - 1) + 1):
+        if sigma[l]:
+          discrepancy ^= MUL[sigma[l]][syndromes[i - l]]
+      if not discrepancy:
+        shift += 1
+        continue
+
+      # sigma -= (discrepancy / previous_discrepancy) * z^shift * previous
+      row = MUL[gf256.div(discrepancy, previous_discrepancy)]
+      update = sigma[:]
+      if len(update) < len(previous) + shift:
+        update.extend([0] * (len(previous) + shift - len(update)))
+      for l, coefficient in enumerate(previous):
+        update[l + shift] ^= row[coefficient]
+
+      if 2 * length <= i + e:
+        previous = sigma
+        previous_discrepancy = discrepancy
+        length = i + 1 + e - length
+        shift = 1
+      else:
+        shift += 1
+      sigma = update
+
+    while len(sigma) > 1 and not sigma[-1]:
+      sigma.pop()
+
+    omega = [0] * len(syndromes)
+    for l, coefficient in enumerate(sigma):
+      if coefficient:
+        row = MUL[coefficient]
+        for i in xrange(len(syndromes) - l):
+          omega[l + i] ^= row[syndromes[i]]
+    return sigma, omega
+
+  def _chien_search(self, sigma):
+    """Finds the roots of sigma, whose inverses are the error locations.
+    Returns the list of error positions j (α^j being the error location),
+    or None if sigma does not have as many distinct roots in the codeword
+    as its degree. Whether that many errors are correctable at all is for
+    the caller to check.
+
+    This is Chien's search: every term of sigma is carried from one
+    position to the next with a single multiplication, done here as an
+    addition of logarithms.
+    """
+    num_errors = len(sigma) - 1
+    if not num_errors:
+      return None
+
+    # Position j is a root when sigma(α^(-j)) is zero. logs[l] is the
+    # logarithm of term l at the current position; stepping to the next
+    # position multiplies term l by α^(-l).
+    powers = [l for l in xrange(1, num_errors + 1) if sigma[l]]
+    logs = [LOG[sigma[l]] for l in powers]
+    steps = [255 - l for l in powers]
+    constant = sigma[0]
+
+    j = []
+    for position in xrange(self.n):
+      value = constant
+      for log in logs:
+        value ^= EXP[log]
+      if not value:
+        j.append(position)
+        if len(j) == num_errors:
+          return j
+      logs = [(log + step) % 255 for log, step in zip(logs, steps)]
+    return None
+
+  def _forney(self, sigma, omega, j):
+    """Computes the error magnitudes at positions j with Forney's formula,
+    Y = omega(X^-1) / sigma'(X^-1), or returns None if one is undefined"""
+    # The formal derivative of sigma keeps only its odd powers.
+    derivative = [sigma[l] if l % 2 else 0 for l in xrange(1, len(sigma))]
+
+    Y = []
+    for position in j:
+      X_inverse = EXP[255 - position]
+      numerator = _evaluate(omega, X_inverse)
+      denominator = _evaluate(derivative, X_inverse)
+      if not denominator:
+        return None
+      Y.append(gf256.div(numerator, denominator))
+    return Y
+
+
+def _evaluate(p, x):
+  """Evaluates the polynomial p, given in order of increasing power, at x"""
+  row = MUL[x]
+  y = 0
+  for coefficient in reversed(p):
+    y = row[y] ^ coefficient
+  return y
+
+
+class PolynomialRSCoder(object):
+  """The original RSCoder, doing all its arithmetic with GF256int and
+  Polynomial objects. It is much slower, and is kept as the reference
+  implementation that RSCoder is checked against.
+  """
+
+
   def __init__(self, n, k):
     """Creates a new Reed-Solomon Encoder/Decoder object configured with
     the given n and k values.
@@ -370,7 +834,7 @@ class RSCoder(object):
 if __name__ == "__main__":
   import sys
   coder = RSCoder(255,223)
-  print coder.g
+  print Polynomial(GF256int(x) for x in coder.g)
   if "-d" in sys.argv:
     method = coder.decode
     blocksize = 255
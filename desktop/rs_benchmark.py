@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# Reed-Solomon equivalence harness and throughput dashboard. Runs every
+# implementation in IMPLEMENTATIONS side by side with the reference
+# (rs.PolynomialRSCoder, the original GF256int + Polynomial code) over
+# randomized messages, leading-null-byte edge cases and injected errors up to
+# and beyond the correction capacity, and reports encode/decode throughput
+# per implementation as JSON. Exits non-zero on any mismatch.
+#
+# Within capacity every implementation must return exactly what the
+# reference does. Beyond it the reference returns garbage (of the wrong
+# length, even), so an implementation must instead either give up, returning
+# the message part as received, or decode to some codeword no further than
+# (n-k)/2 from what it received.
+
+import argparse
+import json
+import logging
+import numpy
+import random
+import rs
+import sys
+import time
+
+logging.basicConfig(stream=sys.stderr, level=logging.WARNING,
+                    format='%(asctime)-15s %(levelname)8s %(module)10s '\
+                      '%(lineno)4d %(message)s')
+
+# The (n, k) that code.py accepts: 0 < k < n <= 255.
+ALL_PARAMETERS = [(n, k) for n in range(2, 256) for k in range(1, n)]
+
+# code.py's default, the standard code and the extremes. The reference
+# takes minutes per decode when n-k is large (255,1 for one), so checking
+# ALL_PARAMETERS takes days; --sample checks a random subset.
+DEFAULT_PARAMETERS = [(128, 64), (255, 223), (2, 1), (3, 1), (255, 254),
+                      (16, 8), (32, 30)]
+
+
+class _Scalar(object):
+  # An implementation with RSCoder's encode/decode interface.
+  def __init__(self, cls, n, k):
+    self.coder = cls(n, k)
+
+  def encode(self, messages):
+    return [self.coder.encode(message) for message in messages]
+
+  def decode(self, codes, nostrip):
+    return [self.coder.decode(code, nostrip=nostrip) for code in codes]
+
+
+class _Batched(object):
+  # RSCoder's encode_many/decode_many, fed every message at once. Short
+  # messages are left padded with null bytes, as encode does.
+  def __init__(self, cls, n, k):
+    self.coder = cls(n, k)
+
+  def encode(self, messages):
+    k = self.coder.k
+    blocks = numpy.frombuffer(
+      ''.join(message.rjust(k, '\0') for message in messages),
+      dtype=numpy.uint8).reshape(len(messages), k)
+    return [code.tostring() for code in self.coder.encode_many(blocks)]
+
+  def decode(self, codes, nostrip):
+    blocks = numpy.frombuffer(''.join(codes), dtype=numpy.uint8).reshape(
+      len(codes), self.coder.n)
+    messages = [message.tostring()
+                for message in self.coder.decode_many(blocks)]
+    if nostrip:
+      return messages
+    return [message.lstrip('\0') for message in messages]
+
+
+# Implementations under test, by name: factories of (n, k).
+IMPLEMENTATIONS = {
+  'RSCoder': lambda n, k: _Scalar(rs.RSCoder, n, k),
+  'RSCoder.many': lambda n, k: _Batched(rs.RSCoder, n, k),
+}
+
+REFERENCE = 'PolynomialRSCoder'
+
+
+def _reference(n, k):
+  return _Scalar(rs.PolynomialRSCoder, n, k)
+
+
+def messages(k, count, generator):
+  # Random messages of k bytes.
+  return [''.join(chr(generator.randint(0, 255)) for _ in xrange(k))
+          for _ in xrange(count)]
+
+
+def edge_messages(k, generator):
+  # Short and empty messages, and ones with leading (or only) null bytes,
+  # which decode strips unless nostrip.
+  message = messages(k, 1, generator)[0]
+  return ['', '\0' * k, message[:k // 2], '\0' + message[1:],
+          ('\0\0' + message[2:])[:k], message[:-1] + '\0']
+
+
+def corrupt(code, num_errors, generator):
+  code = bytearray(code)
+  for position in generator.sample(xrange(len(code)), num_errors):
+    code[position] ^= generator.randint(1, 255)
+  return str(code)
+
+
+def error_counts(n, k):
+  # Error counts to inject: none, a few, up to the capacity (n-k)/2 and two
+  # past it (where possible).
+  capacity = (n - k) // 2
+  counts = [0, 1, capacity // 2, capacity - 1, capacity, capacity + 1,
+            capacity + 2]
+  return sorted(set(count for count in counts if 0 <= count <= n))
+
+
+def _distance(a, b):
+  return sum(1 for x, y in zip(a, b) if x != y)
+
+
+def check(names, n, k, count=2, seed=0):
+  # Checks implementations names against the reference at (n, k). The
+  # reference, which is slow, runs once per case for all of them. Returns
+  # a report per implementation: the number of comparisons and the
+  # mismatches as readable strings.
+  generator = random.Random(seed)
+  reference = _reference(n, k)
+  scalar = rs.RSCoder(n, k)
+  capacity = (n - k) // 2
+
+  # Random messages get every error count, the edge cases none and
+  # (n-k)/2.
+  originals = messages(k, count, generator)
+  edges = edge_messages(k, generator)
+  encoded = reference.encode(originals + edges)
+  received = []
+  for num_errors in error_counts(n, k):
+    received.extend((num_errors, corrupt(code, num_errors, generator))
+                    for code in encoded[:count])
+  for num_errors in sorted(set((0, capacity))):
+    received.extend((num_errors, corrupt(code, num_errors, generator))
+                    for code in encoded[count:])
+
+  # What the reference decodes within capacity; beyond it, None.
+  expected = {}
+  for nostrip in (True, False):
+    within = [code for num_errors, code in received if num_errors <= capacity]
+    expected[nostrip] = dict(zip(within, reference.decode(within, nostrip)))
+
+  reports = []
+  for name in names:
+    implementation = IMPLEMENTATIONS[name](n, k)
+    mismatches = []
+    comparisons = 0
+    for message, want, got in zip(originals + edges, encoded,
+                                  implementation.encode(originals + edges)):
+      comparisons += 1
+      if want != got:
+        mismatches.append('%s %d,%d: encode(%r) differs.' % (name, n, k,
+                                                             message))
+
+    codes = [code for _, code in received]
+    for nostrip in (True, False):
+      decoded = implementation.decode(codes, nostrip)
+      for (num_errors, code), got in zip(received, decoded):
+        comparisons += 1
+        if num_errors <= capacity:
+          if expected[nostrip][code] != got:
+            mismatches.append('%s %d,%d: decode(%r, nostrip=%s) with %d '
+                              'errors differs.' % (name, n, k, code, nostrip,
+                                                   num_errors))
+          continue
+        # Beyond capacity: gave up, or a codeword within capacity.
+        as_received = code[:k] if nostrip else code[:k].lstrip('\0')
+        if got != as_received and \
+            _distance(scalar.encode(got.rjust(k, '\0')), code) > capacity:
+          mismatches.append('%s %d,%d: decode(%r, nostrip=%s) with %d errors '
+                            'is no nearby codeword.' % (name, n, k, code,
+                                                        nostrip, num_errors))
+    for mismatch in mismatches:
+      logging.error(mismatch)
+    reports.append({'implementation': name, 'n': n, 'k': k,
+                    'comparisons': comparisons, 'mismatches': mismatches})
+  return reports
+
+
+def _best_time(function, repeat):
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.time()
+    function()
+    best = min(best, time.time() - start)
+  return max(best, 1e-9)
+
+
+def measure(name, n, k, count=200, repeat=3, seed=0):
+  # Encode and decode throughput of an implementation (or the reference) in
+  # message bytes per second, decoding clean codewords and codewords with
+  # (n-k)/2 errors.
+  generator = random.Random(seed)
+  if name == REFERENCE:
+    implementation = _reference(n, k)
+  else:
+    implementation = IMPLEMENTATIONS[name](n, k)
+  originals = [''.join(chr(generator.randint(0, 255)) for _ in xrange(k))
+               for _ in xrange(count)]
+  codes = implementation.encode(originals)
+  damaged = [corrupt(code, (n - k) // 2, generator) for code in codes]
+  message_bytes = float(count * k)
+  return {
+    'implementation': name, 'n': n, 'k': k,
+    'encode_bytes_per_sec':
+      message_bytes / _best_time(lambda: implementation.encode(originals),
+                                 repeat),
+    'decode_clean_bytes_per_sec':
+      message_bytes / _best_time(lambda: implementation.decode(codes, True),
+                                 repeat),
+    'decode_damaged_bytes_per_sec':
+      message_bytes / _best_time(lambda: implementation.decode(damaged, True),
+                                 repeat),
+  }
+
+
+def run(names, parameters, count=2, speed_parameters=(), speed_count=200,
+        reference_speed_count=4, repeat=3, verbose=False):
+  report = {'checks': [], 'throughput': []}
+  for n, k in parameters:
+    report['checks'].extend(check(names, n, k, count))
+    if verbose:
+      print >> sys.stderr, '%3d,%3d checked.' % (n, k)
+
+  for n, k in speed_parameters:
+    for name in [REFERENCE] + list(names):
+      if name == REFERENCE:
+        # The reference is too slow to time at length.
+        result = measure(name, n, k, reference_speed_count, 1)
+      else:
+        result = measure(name, n, k, speed_count, repeat)
+      if verbose:
+        print >> sys.stderr, (
+          '%(implementation)17s %(n)3d,%(k)3d: encode '
+          '%(encode_bytes_per_sec)9.0f decode %(decode_clean_bytes_per_sec)9.0f'
+          ' (clean) %(decode_damaged_bytes_per_sec)9.0f (damaged) bytes/sec.'
+          % result)
+      report['throughput'].append(result)
+  return report
+
+
+def main(argv):
+  def parameter_list(value):
+    return [tuple(int(x) for x in pair.split(',')) for pair in value.split()]
+
+  parser = argparse.ArgumentParser(
+    prog='rs_benchmark',
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+  parser.add_argument('-i', '--implementations', type=str,
+                      default=','.join(sorted(IMPLEMENTATIONS)),
+                      help='Comma-separated implementations to check.')
+  parser.add_argument('-p', '--parameters', type=parameter_list,
+                      default=' '.join('%d,%d' % p for p in DEFAULT_PARAMETERS),
+                      help='Space-separated n,k pairs to check.')
+  parser.add_argument('-a', '--all', action='store_true',
+                      help='Check every n,k pair code.py accepts (days).')
+  parser.add_argument('--sample', type=int, default=0,
+                      help='Also check this many random n,k pairs that '
+                      'code.py accepts.')
+  parser.add_argument('-c', '--count', type=int, default=2,
+                      help='Random messages per n,k pair and error count.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed for the sampled n,k pairs.')
+  parser.add_argument('-s', '--speed_parameters', type=parameter_list,
+                      default='128,64 255,223',
+                      help='Space-separated n,k pairs to time.')
+  parser.add_argument('-r', '--repeat', type=int, default=3,
+                      help='Timing runs; the fastest is reported.')
+  parser.add_argument('-o', '--output', type=str, default=None,
+                      help='File to write the JSON report to (else stdout).')
+  parser.add_argument('-v', '--verbose', action='store_true',
+                      help='Print throughput as it is measured.')
+  FLAGS = parser.parse_args(argv[1:])
+
+  names = FLAGS.implementations.split(',')
+  for name in names:
+    if name not in IMPLEMENTATIONS:
+      parser.error('Unknown implementation: %s.' % name)
+
+  if FLAGS.all:
+    parameters = ALL_PARAMETERS
+  else:
+    parameters = FLAGS.parameters + \
+        random.Random(FLAGS.seed).sample(ALL_PARAMETERS, FLAGS.sample)
+  report = run(names, parameters, FLAGS.count, FLAGS.speed_parameters,
+               repeat=FLAGS.repeat, verbose=FLAGS.verbose)
+  output = json.dumps(report, indent=2, sort_keys=True)
+  if FLAGS.output:
+    with open(FLAGS.output, 'w') as fh:
+      fh.write(output + '\n')
+  else:
+    print output
+
+  if any(check['mismatches'] for check in report['checks']):
+    return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
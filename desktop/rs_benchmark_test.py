@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import random
+import rs_benchmark
+import unittest
+
+class RSBenchmarkTest(unittest.TestCase):
+  def test_check(self):
+    reports = rs_benchmark.check(sorted(rs_benchmark.IMPLEMENTATIONS), 12, 6,
+                                 count=1)
+    self.assertEqual(sorted(rs_benchmark.IMPLEMENTATIONS),
+                     [report['implementation'] for report in reports])
+    for report in reports:
+      self.assertEqual([], report['mismatches'])
+      self.assertTrue(report['comparisons'] > 0)
+
+  def test_check_catches_a_wrong_decoder(self):
+    class Wrong(object):
+      def __init__(self, n, k):
+        self.implementation = rs_benchmark.IMPLEMENTATIONS['RSCoder'](n, k)
+        self.encode = self.implementation.encode
+
+      def decode(self, codes, nostrip):
+        return [message[::-1] for message in
+                self.implementation.decode(codes, nostrip)]
+
+    rs_benchmark.IMPLEMENTATIONS['wrong'] = Wrong
+    try:
+      report, = rs_benchmark.check(['wrong'], 8, 4, count=1)
+    finally:
+      del rs_benchmark.IMPLEMENTATIONS['wrong']
+    self.assertTrue(report['mismatches'])
+
+  def test_error_counts(self):
+    self.assertEqual([0, 1, 2, 3, 4, 5, 6], rs_benchmark.error_counts(20, 12))
+    self.assertEqual([0, 1, 2], rs_benchmark.error_counts(2, 1))
+
+  def test_edge_messages(self):
+    edges = rs_benchmark.edge_messages(8, random.Random(0))
+    self.assertTrue('' in edges)
+    self.assertTrue('\0' * 8 in edges)
+    self.assertTrue(all(len(message) <= 8 for message in edges))
+
+  def test_measure(self):
+    result = rs_benchmark.measure('RSCoder.many', 32, 16, count=10, repeat=1)
+    self.assertTrue(result['encode_bytes_per_sec'] > 0)
+    self.assertTrue(result['decode_damaged_bytes_per_sec'] > 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
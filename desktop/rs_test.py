@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import numpy
+import random
+import rs
+import unittest
+
+class RSCoderTest(unittest.TestCase):
+  def setUp(self):
+    self.random = random.Random(0)
+
+  def _message(self, length):
+    return ''.join(chr(self.random.randint(0, 255)) for _ in range(length))
+
+  def _corrupt(self, code, num_errors):
+    code = bytearray(code)
+    for position in self.random.sample(range(len(code)), num_errors):
+      code[position] ^= self.random.randint(1, 255)
+    return str(code)
+
+  def test_matches_reference(self):
+    for n, k in ((20, 10), (32, 16), (15, 14), (9, 1)):
+      coder = rs.RSCoder(n, k)
+      reference = rs.PolynomialRSCoder(n, k)
+      for length in (k, k - 1, 0):
+        message = self._message(length)
+        code = coder.encode(message)
+        self.assertEqual(reference.encode(message), code)
+        for num_errors in range((n - k) // 2 + 1):
+          received = self._corrupt(code, num_errors)
+          self.assertEqual(reference.decode(received), coder.decode(received))
+          self.assertEqual(reference.decode(received, nostrip=True),
+                           coder.decode(received, nostrip=True))
+
+  def test_encode_matches_reference_at_extremes(self):
+    for n, k in ((2, 1), (255, 1), (255, 254), (128, 64)):
+      coder = rs.RSCoder(n, k)
+      reference = rs.PolynomialRSCoder(n, k)
+      for message in (self._message(k), '\0' + self._message(k - 1), ''):
+        self.assertEqual(reference.encode(message), coder.encode(message))
+        self.assertTrue(coder.verify(coder.encode(message)))
+
+  def test_round_trip(self):
+    coder = rs.RSCoder(255, 223)
+    message = self._message(223)
+    code = coder.encode(message)
+    self.assertEqual(255, len(code))
+    self.assertTrue(coder.verify(code))
+    received = self._corrupt(code, 16)
+    self.assertFalse(coder.verify(received))
+    self.assertEqual(message, coder.decode(received, nostrip=True))
+
+  def test_too_many_errors(self):
+    coder = rs.RSCoder(20, 10)
+    received = self._corrupt(coder.encode(self._message(10)), 8)
+    self.assertEqual(received[:10], coder.decode(received, nostrip=True))
+
+  def test_short_message_is_padded(self):
+    coder = rs.RSCoder(20, 10)
+    code = coder.encode('abc')
+    self.assertEqual('\0' * 7 + 'abc', code[:10])
+    self.assertEqual('abc', coder.decode(code))
+    self.assertEqual('\0' * 7 + 'abc', coder.decode(code, nostrip=True))
+
+  def test_many_matches_single(self):
+    coder = rs.RSCoder(32, 20)
+    messages = numpy.array([[self.random.randint(0, 255) for _ in range(20)]
+                            for _ in range(40)], dtype=numpy.uint8)
+    codes = coder.encode_many(messages)
+    self.assertEqual((40, 32), codes.shape)
+    for message, code in zip(messages, codes):
+      self.assertEqual(coder.encode(message.tostring()), code.tostring())
+
+    for i, num_errors in enumerate((0, 1, 6, 9) * 10):
+      codes[i] = bytearray(self._corrupt(codes[i].tostring(), num_errors))
+    decoded = coder.decode_many(codes)
+    for code, message in zip(codes, decoded):
+      self.assertEqual(coder.decode(code.tostring(), nostrip=True),
+                       message.tostring())
+    self.assertEqual(messages[:3].tostring(), decoded[:3].tostring())
+    self.assertRaises(ValueError, coder.decode_many, codes[:, :20])
+
+  def test_erasures(self):
+    coder = rs.RSCoder(40, 20)
+    message = self._message(20)
+    code = coder.encode(message)
+    positions = self.random.sample(range(40), 20)
+
+    # Up to n-k erasures alone, or erasures and errors within the budget.
+    for num_erasures, num_errors in ((20, 0), (10, 5), (1, 9), (0, 10)):
+      received = bytearray(code)
+      for position in positions[:num_erasures + num_errors]:
+        received[position] ^= self.random.randint(1, 255)
+      erasures = positions[:num_erasures]
+      self.assertEqual(message, coder.decode(str(received), nostrip=True,
+                                             erasures=erasures))
+      mask = numpy.zeros((1, 40), dtype=bool)
+      mask[0, erasures] = True
+      self.assertEqual(message, coder.decode_many(
+        numpy.frombuffer(str(received), dtype=numpy.uint8).reshape(1, 40),
+        mask).tostring())
+
+    # Erased bytes that happen to be right cost nothing.
+    received = self._corrupt(code, 10)
+    self.assertEqual(message, coder.decode(received, nostrip=True,
+                                           erasures=[0, 39]))
+    self.assertRaises(ValueError, coder.decode_many,
+                      numpy.zeros((1, 40)), numpy.zeros((2, 40), dtype=bool))
+
+  def test_decode_many_soft(self):
+    coder = rs.RSCoder(40, 20)
+    messages = numpy.array([[self.random.randint(0, 255) for _ in range(20)]
+                            for _ in range(3)], dtype=numpy.uint8)
+    codes = coder.encode_many(messages)
+    confidence = numpy.ones(codes.shape)
+    # 12 errors are too many for errors alone, but not when 4 of them are
+    # the least confident bytes. The last codeword is hopeless.
+    for row, num_errors, num_doubtful in ((0, 12, 4), (1, 3, 0), (2, 30, 0)):
+      positions = self.random.sample(range(40), num_errors)
+      for position in positions:
+        codes[row, position] ^= self.random.randint(1, 255)
+      confidence[row, positions[:num_doubtful]] = 0.5
+    self.assertNotEqual(messages[0].tostring(),
+                        coder.decode_many(codes)[0].tostring())
+    decoded = coder.decode_many_soft(codes, confidence)
+    self.assertEqual(messages[:2].tostring(), decoded[:2].tostring())
+    self.assertEqual(codes[2, :20].tostring(), decoded[2].tostring())
+    self.assertRaises(ValueError, coder.decode_many_soft, codes,
+                      confidence[:2])
+
+  def test_invalid_parameters(self):
+    self.assertRaises(ValueError, rs.RSCoder, 256, 10)
+    self.assertRaises(ValueError, rs.RSCoder, 10, 10)
+    self.assertRaises(ValueError, rs.RSCoder(20, 10).encode, 'x' * 11)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 from hashlib import sha256, md5
+from PIL import Image
 import math
+import numpy
 
 def bsearch(a, x, lo=0, hi=None):
   if hi is None:
@@ -41,6 +43,35 @@ def average(iterable):
     return 0
   return sum([float(i) for i in iterable]) / len(iterable)
 
+def base64_byte_confidence(confidence, num_bytes=None):
+  # Per-byte confidence of base64 data given that of each character: every
+  # byte is spread over two neighboring characters and is only as certain as
+  # the less certain of them. Byte i of a group of three takes its bits from
+  # characters i and i + 1 of the group's four.
+  confidence = numpy.asarray(confidence)
+  if num_bytes is None:
+    num_bytes = len(confidence) * 3 // 4
+  first = numpy.arange(num_bytes)
+  first += first // 3
+  return numpy.minimum(confidence[first], confidence[first + 1])
+
+def draft_resize(image, size):
+  # Resizes image to size. Shrinking it by half or more, a JPEG that is not
+  # loaded yet is first decoded at the smallest of 1/1, 1/2, 1/4 and 1/8
+  # scale that is still at least size (libjpeg scales in the DCT, so this
+  # costs a fraction of a full decode), then resampled with an antialiasing
+  # filter, as skipping that many pixels would alias. A milder change keeps
+  # the much cheaper nearest neighbour resize.
+  if image.size == size:
+    return image
+  width, height = image.size
+  if width < 2 * size[0] or height < 2 * size[1]:
+    return image.resize(size, Image.NEAREST)
+  image.draft(image.mode, size)
+  if image.size != size:
+    image = image.resize(size, Image.ANTIALIAS)
+  return image
+
 def sha256hash(to_hash):
   integrity_hash = sha256()
   integrity_hash.update(to_hash)
@@ -51,3 +82,24 @@ def md5hash(to_hash):
   hash_func = md5()
   hash_func.update(to_hash)
   return hash_func.hexdigest()
+
+class IntegrityStream(object):
+  # Consumes a decoded payload (a SHA-256 hex digest followed by the data it
+  # covers) chunk by chunk, hashing the data as it arrives. Only the hash
+  # state and the check are kept: update returns the chunk's data, for the
+  # caller to pass on to the next stage.
+  def __init__(self, check_length=64):
+    self.check_length = check_length
+    self.extracted_check = ''
+    self._hash = sha256()
+
+  def update(self, chunk):
+    needed = self.check_length - len(self.extracted_check)
+    if needed > 0:
+      self.extracted_check += chunk[:needed]
+      chunk = chunk[needed:]
+    self._hash.update(chunk)
+    return chunk
+
+  def hexdigest(self):
+    return self._hash.hexdigest()
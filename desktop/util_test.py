@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 
-from util import bsearch
+from PIL import Image
+from util import base64_byte_confidence, bsearch, draft_resize, sha256hash, \
+    IntegrityStream
+import cStringIO
 import unittest
 
 class UtilTest(unittest.TestCase):
@@ -15,5 +18,49 @@ class UtilTest(unittest.TestCase):
   def test_float(self):
     self.assertEqual(6, bsearch(self.array, self.to_find_float))
 
+class Base64ByteConfidenceTest(unittest.TestCase):
+  def test_bytes_span_two_characters(self):
+    confidence = [1, .5, 1, 1, .2, 1, .9, .8]
+    self.assertEqual([.5, .5, 1, .2, .9, .8],
+                     list(base64_byte_confidence(confidence)))
+    self.assertEqual([.5, .5, 1, .2],
+                     list(base64_byte_confidence(confidence, 4)))
+
+class IntegrityStreamTest(unittest.TestCase):
+  def test_chunks(self):
+    data = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' * 10
+    payload = sha256hash(data) + data
+    stream = IntegrityStream()
+    passed_on = ''.join(stream.update(payload[i:i+7])
+                        for i in range(0, len(payload), 7))
+    self.assertEqual(sha256hash(data), stream.extracted_check)
+    self.assertEqual(sha256hash(data), stream.hexdigest())
+    self.assertEqual(data, passed_on)
+
+class DraftResizeTest(unittest.TestCase):
+  def test_jpeg(self):
+    jpeg = cStringIO.StringIO()
+    Image.new('RGB', (800, 600), (200, 100, 50)).save(jpeg, 'JPEG')
+    jpeg.seek(0)
+    image = Image.open(jpeg)
+    resized = draft_resize(image, (150, 112))
+    self.assertEqual((150, 112), resized.size)
+    # Decoded at 1/4 scale, the smallest still at least 150 x 112.
+    self.assertEqual((200, 150), image.size)
+
+  def test_mild(self):
+    # Less than half the size is not worth a draft decode.
+    jpeg = cStringIO.StringIO()
+    Image.new('RGB', (800, 600), (200, 100, 50)).save(jpeg, 'JPEG')
+    jpeg.seek(0)
+    image = Image.open(jpeg)
+    self.assertEqual((500, 375), draft_resize(image, (500, 375)).size)
+    self.assertEqual((800, 600), image.size)
+
+  def test_loaded(self):
+    image = Image.new('RGB', (80, 60))
+    self.assertEqual((30, 20), draft_resize(image, (30, 20)).size)
+    self.assertTrue(draft_resize(image, (80, 60)) is image)
+
 if __name__ == '__main__':
   unittest.main()
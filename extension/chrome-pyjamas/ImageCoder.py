@@ -7,6 +7,10 @@ class SymbolSignalCoder(object):
     pass
   def signal_to_symbol(self, values):
     pass
+  def encode_many(self, symbols):
+    pass
+  def decode_many(self, signals):
+    pass
 
 class MessageSymbolCoder(object):
   encoding = None
@@ -14,6 +18,10 @@ class MessageSymbolCoder(object):
     pass
   def symbol_to_message(self, values):
     pass
+  def encode_many(self, message):
+    pass
+  def decode_many(self, symbols):
+    pass
 
 class Base64SymbolSignalCoder(SymbolSignalCoder):
   thresholds = { # Well, nine (we add one for "black").
@@ -31,25 +39,28 @@ class Base64SymbolSignalCoder(SymbolSignalCoder):
   _inv_thresholds = dict((v,k) for k, v in thresholds.iteritems())
   _keys = sorted(_inv_thresholds.keys())
 
+  def __init__(self):
+    # Symbol value -> signal, and floored luminance -> symbol value. The
+    # thresholds are 28 apart, so every point halfway between two of them is
+    # an integer and flooring an average before the lookup loses nothing.
+    self._signals = []
+    for i in range(len(self.thresholds)):
+      self._signals.append(self.thresholds[str(i)])
+
+    keys = []
+    inv_thresholds = {}
+    for symbol in self.thresholds:
+      keys.append(self.thresholds[symbol])
+      inv_thresholds[self.thresholds[symbol]] = int(symbol)
+    keys.sort()
+    self._symbols = []
+    for lum in range(256):
+      self._symbols.append(inv_thresholds[keys[bsearch(keys, lum)]])
+
   def symbol_to_signal(self, symbol_val):
     return self.thresholds[symbol_val]
 
   def signal_to_symbol(self, values):
-    thresholds = { # Well, nine (we add one for "black").
-      '0': 235,
-      '1': 207,
-      '2': 179,
-      '3': 151,
-      '4': 123,
-      '5': 95,
-      '6': 67,
-      '7': 39,
-      '8': 11,
-      }
-
-    _inv_thresholds = dict((v,k) for k, v in thresholds.iteritems())
-    _keys = sorted(_inv_thresholds.keys())
-
     ret = []
     for sym_i in values:
       sym_values = values.get(sym_i)
@@ -57,16 +68,34 @@ class Base64SymbolSignalCoder(SymbolSignalCoder):
       for coord in sym_values:
         _values.append(sym_values.get(coord))
       avg_value = average(_values)
-      _bs = bsearch(_keys, avg_value)
-      _key = _keys[_bs]
-      base8 = _inv_thresholds[_key]
-      ret.append(base8)
+      ret.append(str(self._symbols[min(int(avg_value), 255)]))
+    return ret
+
+  def encode_many(self, symbols):
+    ret = []
+    for symbol_values in symbols:
+      signals = []
+      for symbol_val in symbol_values:
+        signals.append(self._signals[int(symbol_val)])
+      ret.append(signals)
+    return ret
+
+  def decode_many(self, signals):
+    ret = []
+    for avg_value in signals:
+      ret.append(self._symbols[min(int(avg_value), 255)])
     return ret
 
 class Base64MessageSymbolCoder(MessageSymbolCoder):
   encoding = 'base64'
   values = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
 
+  def __init__(self):
+    # Character -> [high, low] octal digits.
+    self._symbols = {}
+    for i in range(len(self.values)):
+      self._symbols[self.values[i]] = [int(i / 8), i % 8]
+
   def message_to_symbol(self, char):
     index = self.values.find(char)
     octal_val = '%02s' % oct(index)[1:]
@@ -79,3 +108,17 @@ class Base64MessageSymbolCoder(MessageSymbolCoder):
     index = int('%d%d' % (values[0], values[1]), 8)
     ret = self.values[index]
     return ret
+
+  def encode_many(self, message):
+    ret = []
+    for char in message:
+      ret.append(self._symbols[char])
+    return ret
+
+  def decode_many(self, symbols):
+    ret = []
+    for values in symbols:
+      if values[0] == 8 or values[1] == 8:
+        continue
+      ret.append(self.values[values[0] * 8 + values[1]])
+    return ''.join(ret)
@@ -7,13 +7,13 @@ class SymbolShape(object):
   # for 'empty' coordinates).
   # TODO(tierney): What to do about empty coordinates.
 
-  _analyzed = False
-  _index_map = {}
-  _width = -1
-  _height = -1
-
   def __init__(self, shape):
     self.shape = shape
+    # Per-instance state; a class-level map would be shared by every shape.
+    self._analyzed = False
+    self._index_map = {}
+    self._width = -1
+    self._height = -1
 
   def get_num_symbol_shapes(self):
     # Count the number of distinct symbol_shapes, ignoring zero-valued